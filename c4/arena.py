@@ -52,6 +52,9 @@ def arena(engines, rounds):
 
             stats[looser_name].loose += 1
 
+    for name, e in engines:
+        e.close()
+
     rank = sorted(stats.items(), key=lambda x: x[1].score, reverse=True)
     formats = '%-3s  | %-16s | %5s | %4s | %4s | %4s'
     print(formats % ('N.', 'Name', 'Score', 'Win', 'WinX', 'WinO'))
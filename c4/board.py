@@ -1,6 +1,6 @@
 import numpy as np
 
-from c4.tables import rev_segments, all_segments
+from c4.tables import rev_segments, all_segments, zobrist
 
 
 PLAYER1 = 1
@@ -8,6 +8,77 @@ PLAYER2 = 2
 DRAW = 0
 COMPUTE = -1
 
+#
+# Bitboard layout
+#
+# Every column takes HEIGHT = ROWS + 1 bits, the extra bit on top of each
+# column is a sentinel that is always empty, so that shifting a mask never
+# carries pieces from one column to the next one:
+#
+#    6 13 20 27 34 41 48
+#    5 12 19 26 33 40 47
+#    4 11 18 25 32 39 46
+#    3 10 17 24 31 38 45
+#    2  9 16 23 30 37 44
+#    1  8 15 22 29 36 43
+#    0  7 14 21 28 35 42
+#
+
+COLS = 7
+ROWS = 6
+HEIGHT = ROWS + 1
+
+BOTTOM = sum(1 << (c * HEIGHT) for c in range(COLS))
+FULL = BOTTOM * ((1 << ROWS) - 1)
+
+# bit index of the squares, in the same order of the flattened array form
+_squares = np.array([c * HEIGHT + r for c in range(COLS) for r in range(ROWS)],
+                    dtype=np.uint64)
+
+
+def connected4(bits):
+    """Returns True if the mask contains four aligned pieces"""
+
+    # vertical, horizontal and the two diagonals
+    for shift in (1, HEIGHT, HEIGHT - 1, HEIGHT + 1):
+        m = bits & (bits >> shift)
+        if m & (m >> (2 * shift)):
+            return True
+    return False
+
+
+def winning_squares(bits, mask):
+    """Returns the mask of the empty squares that complete a four of bits
+
+    mask is the mask of the occupied squares. The squares are not
+    necessarily playable yet.
+
+    """
+    # vertical
+    w = (bits << 1) & (bits << 2) & (bits << 3)
+
+    # horizontal and diagonals, the missing piece can be in any position
+    for shift in (HEIGHT, HEIGHT - 1, HEIGHT + 1):
+        p = (bits << shift) & (bits << (2 * shift))
+        w |= p & (bits << (3 * shift))
+        w |= p & (bits >> shift)
+        p = (bits >> shift) & (bits >> (2 * shift))
+        w |= p & (bits << shift)
+        w |= p & (bits >> (3 * shift))
+
+    return w & (FULL ^ mask)
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def columns(bits):
+    """Returns the columns that have at least a square in the mask"""
+
+    colmask = (1 << HEIGHT) - 1
+    return [c for c in range(COLS) if bits & (colmask << (c * HEIGHT))]
+
 
 class WrongMoveError(Exception):
     pass
@@ -15,15 +86,56 @@ class WrongMoveError(Exception):
 
 class Board(object):
     def __init__(self, pos=None, stm=PLAYER1, end=COMPUTE, cols=7, rows=6):
-        if pos is None:
-            pos = np.zeros((cols, rows), dtype=int)
-        self._pos = pos
+        # _bits[PLAYER1] and _bits[PLAYER2] are the pieces of each player,
+        # _bits[0] keeps all the occupied squares
+        self._bits = [0, 0, 0]
+        self._heights = [0] * COLS
+        # zobrist keys of the position and of its mirror image
+        self._key = 0
+        self._mkey = 0
+        # moves played with push() that can be taken back with pop()
+        self._history = []
+        if pos is not None:
+            self._load(pos)
         self._stm = stm
         if end == COMPUTE:
-            self._end = self._check_end(pos)
+            self._end = self._check_end()
         else:
             self._end = end
 
+    @classmethod
+    def _frombits(cls, bits, heights, key, mkey, stm, end):
+        board = cls.__new__(cls)
+        board._bits = bits
+        board._heights = heights
+        board._key = key
+        board._mkey = mkey
+        board._history = []
+        board._stm = stm
+        board._end = end
+        return board
+
+    def _load(self, pos):
+        bits = self._bits
+        for c in range(COLS):
+            for r in range(ROWS):
+                side = int(pos[c][r])
+                if side:
+                    bit = 1 << (c * HEIGHT + r)
+                    bits[side] |= bit
+                    bits[0] |= bit
+                    self._heights[c] = r + 1
+                    self._key ^= zobrist[side][c][r]
+                    self._mkey ^= zobrist[side][COLS - 1 - c][r]
+
+    def to_array(self):
+        """Returns the board as a (cols, rows) array of PLAYER1/PLAYER2/0"""
+
+        p1 = (np.uint64(self._bits[PLAYER1]) >> _squares) & np.uint64(1)
+        p2 = (np.uint64(self._bits[PLAYER2]) >> _squares) & np.uint64(1)
+        pos = p1.astype(int) + PLAYER2 * p2.astype(int)
+        return pos.reshape((COLS, ROWS))
+
     @property
     def end(self):
         return self._end
@@ -32,32 +144,22 @@ class Board(object):
     def stm(self):
         return self._stm
 
+    @property
+    def ply(self):
+        """Number of pieces on the board"""
+        return sum(self._heights)
+
     @property
     def other(self):
         return PLAYER1 if self._stm != PLAYER1 else PLAYER2
 
-    @classmethod
-    def _check_end(cls, pos):
-        for seg in cls.segments(pos):
-            c = np.bincount(seg)
-            if c[0]:
-                continue
-            if c[PLAYER1] == 4:
-                return PLAYER1
-            elif c[PLAYER2] == 4:
-                return PLAYER2
-
-        if pos.all():
-            return DRAW
-        else:
-            return None
+    def _check_end(self):
+        if connected4(self._bits[PLAYER1]):
+            return PLAYER1
+        elif connected4(self._bits[PLAYER2]):
+            return PLAYER2
 
-    @classmethod
-    def _check_end_around(cls, pos, r, c, side):
-        if (cls.segments_around(pos, r, c) == side).all(1).any():
-            return side
-
-        if pos.all():
+        if self._bits[0] == FULL:
             return DRAW
         else:
             return None
@@ -65,7 +167,7 @@ class Board(object):
     @classmethod
     def segments(cls, pos):
         if isinstance(pos, Board):
-            return cls.segments(pos._pos)
+            return cls.segments(pos.to_array())
         else:
             pos = pos.flatten()
             return pos[all_segments]
@@ -73,7 +175,7 @@ class Board(object):
     @classmethod
     def segments_around(cls, pos, r, c):
         if isinstance(pos, Board):
-            return cls.segments_around(pos._pos, r, c)
+            return cls.segments_around(pos.to_array(), r, c)
         else:
             idx = c * pos.shape[1] + r
             pos = pos.flatten()
@@ -87,7 +189,7 @@ class Board(object):
             }
 
         s = []
-        for row in reversed(self._pos.transpose()):
+        for row in reversed(self.to_array().transpose()):
             s.append(' | '.join(disc[x] for x in row))
         s.append(' | '.join('-'*7))
         s.append(' | '.join(map(str, range(1, 8))))
@@ -107,46 +209,232 @@ class Board(object):
         if not (0 <= m < 7):
             raise ValueError(m)
 
-        pos = self._pos.copy()
+        m = int(m)
+        r = self._heights[m]
+        if r >= ROWS:
+            raise WrongMoveError('Full Column')
 
-        r = pos[m].argmin()
-        if pos[m][r] != 0:
+        stm = self._stm
+        bit = 1 << (m * HEIGHT + r)
+        bits = self._bits[:]
+        bits[stm] |= bit
+        bits[0] |= bit
+        heights = self._heights[:]
+        heights[m] = r + 1
+
+        if connected4(bits[stm]):
+            end = stm
+        elif bits[0] == FULL:
+            end = DRAW
+        else:
+            end = None
+
+        key = self._key ^ zobrist[stm][m][r]
+        mkey = self._mkey ^ zobrist[stm][COLS - 1 - m][r]
+
+        return Board._frombits(bits, heights, key, mkey, self.other, end)
+
+    def copy(self):
+        """Returns a new Board with the same position"""
+
+        return Board._frombits(self._bits[:], self._heights[:], self._key,
+                               self._mkey, self._stm, self._end)
+
+    def push(self, m):
+        """Plays the move m changing the board in place
+
+        It is the mutable counterpart of move(): no new Board is allocated
+        and the move can be taken back with pop(). Used by the search
+        engines to walk the game tree.
+
+        """
+        r = self._heights[m]
+        if r >= ROWS:
             raise WrongMoveError('Full Column')
-        pos[m][r] = self._stm
-        end = self._check_end_around(pos, r, m, self._stm)
-        stm = self.other
-        return Board(pos, stm, end)
+
+        stm = self._stm
+        bit = 1 << (m * HEIGHT + r)
+        bits = self._bits
+        bits[stm] |= bit
+        bits[0] |= bit
+        self._heights[m] = r + 1
+        self._key ^= zobrist[stm][m][r]
+        self._mkey ^= zobrist[stm][COLS - 1 - m][r]
+        self._history.append((m, self._end))
+
+        if connected4(bits[stm]):
+            self._end = stm
+        elif bits[0] == FULL:
+            self._end = DRAW
+        self._stm = PLAYER1 if stm != PLAYER1 else PLAYER2
+
+    def pop(self):
+        """Takes back the last move played with push() and returns it"""
+
+        m, self._end = self._history.pop()
+        stm = PLAYER1 if self._stm != PLAYER1 else PLAYER2
+        r = self._heights[m] - 1
+        bit = 1 << (m * HEIGHT + r)
+        self._bits[stm] ^= bit
+        self._bits[0] ^= bit
+        self._heights[m] = r
+        self._key ^= zobrist[stm][m][r]
+        self._mkey ^= zobrist[stm][COLS - 1 - m][r]
+        self._stm = stm
+        return m
 
     def freerow(self, m):
-        r = self._pos[m].argmin()
-        if self._pos[m][r] != 0:
+        r = self._heights[m]
+        if r >= ROWS:
             return None
         return r
 
     def moves(self):
-        return np.flatnonzero(self._pos[:, -1] == 0)
+        return [c for c in range(COLS) if self._heights[c] < ROWS]
+
+    def playable(self):
+        """Returns the mask of the squares where a piece can be dropped"""
+
+        return (self._bits[0] + BOTTOM) & FULL
+
+    def threats(self, side=None):
+        """Returns the mask of the empty squares that would win for side
+
+        side defaults to the side to move.
+
+        """
+        if side is None:
+            side = self._stm
+        return winning_squares(self._bits[side], self._bits[0])
 
-    def hashkey(self):
+    def winning_moves(self):
+        """Returns the columns that win the game immediately"""
+
+        return columns(self.playable() & self.threats())
+
+    def nonlosing_moves(self):
+        """Returns the columns that don't let the opponent win next move
+
+        When the opponent threatens to win the only non losing move is the
+        block, with two threats to block every move loses and the list is
+        empty.
+
+        """
+        playable = self.playable()
+        threats = self.threats(self.other)
+        forced = playable & threats
+        if forced:
+            if forced & (forced - 1):
+                return []
+            playable = forced
+
+        # don't play below a square that wins for the opponent
+        return columns(playable & ~(threats >> 1))
+
+    def count_threats(self, m):
+        """Number of winning squares of the side to move after playing m"""
+
+        bit = 1 << (m * HEIGHT + self._heights[m])
+        return popcount(winning_squares(self._bits[self._stm] | bit,
+                                        self._bits[0] | bit))
+
+    def hashkey(self, move=None):
         """Generates an hashkey
 
         Returns a tuple (key, flip)
         flip is True if it returned the key of the symmetric Board.
 
-        """
-        k1 = 0
-        k2 = 0
+        Keys are zobrist keys updated by move(), so this is O(1).
+        If move is given returns the hashkey of the board after the move,
+        without creating it.
 
-        for x in self._pos.flat:
-            k1 *= 3
-            k1 += int(x)
-            assert k1 >= 0
+        """
+        k1 = self._key
+        k2 = self._mkey
 
-        for x in self._pos[::-1].flat:
-            k2 *= 3
-            k2 += int(x)
-            assert k2 >= 0
+        if move is not None:
+            r = self._heights[move]
+            k1 ^= zobrist[self._stm][move][r]
+            k2 ^= zobrist[self._stm][COLS - 1 - move][r]
 
         if k2 < k1:
             return k2, True
         else:
             return k1, False
+
+
+class BoardBatch(object):
+    """A group of independent boards stored in a single array
+
+    pos is a (n, cols, rows) array with the same layout of Board.to_array(),
+    stm and end are arrays with one item for each board. The end of the
+    boards still in play is PLAYING.
+
+    Moves are applied in place to all the boards at once, this is meant for
+    workloads that play many games together (rollouts, self play, ...).
+
+    """
+    PLAYING = -1
+
+    def __init__(self, n=0, pos=None, stm=None):
+        if pos is None:
+            pos = np.zeros((n, COLS, ROWS), dtype=np.int8)
+        self.pos = np.asarray(pos, dtype=np.int8)
+        n = len(self.pos)
+        if stm is None:
+            stm = np.full(n, PLAYER1, dtype=np.int8)
+        self.stm = np.asarray(stm, dtype=np.int8)
+        self.heights = (self.pos != 0).sum(2)
+        self.end = self.check_end()
+
+    @classmethod
+    def from_boards(cls, boards):
+        boards = list(boards)
+        pos = np.array([b.to_array() for b in boards], dtype=np.int8)
+        stm = np.array([b.stm for b in boards], dtype=np.int8)
+        return cls(pos=pos.reshape((len(boards), COLS, ROWS)), stm=stm)
+
+    def __len__(self):
+        return len(self.pos)
+
+    def __getitem__(self, i):
+        end = self.end[i]
+        return Board(self.pos[i].astype(int), int(self.stm[i]),
+                     None if end == self.PLAYING else int(end))
+
+    def check_end(self):
+        """Computes the end of every board in one pass over all_segments"""
+
+        n = len(self.pos)
+        segments = self.pos.reshape((n, COLS * ROWS))[:, all_segments]
+        end = np.full(n, self.PLAYING, dtype=np.int8)
+        end[(self.heights == ROWS).all(1)] = DRAW
+        end[(segments == PLAYER1).all(2).any(1)] = PLAYER1
+        end[(segments == PLAYER2).all(2).any(1)] = PLAYER2
+        return end
+
+    def legal(self):
+        """Returns a (n, cols) mask of the legal moves of each board"""
+
+        return ((self.heights < ROWS) &
+                (self.end == self.PLAYING)[:, np.newaxis])
+
+    def push(self, moves):
+        """Drops a piece in every board
+
+        moves has a column for each board, boards with a negative move or
+        already finished are left untouched. Raises WrongMoveError if a
+        move is played in a full column.
+
+        """
+        moves = np.asarray(moves)
+        idx = np.flatnonzero((moves >= 0) & (self.end == self.PLAYING))
+        cols = moves[idx]
+        rows = self.heights[idx, cols]
+        if (rows >= ROWS).any():
+            raise WrongMoveError('Full Column')
+
+        self.pos[idx, cols, rows] = self.stm[idx]
+        self.heights[idx, cols] += 1
+        self.stm[idx] = PLAYER1 + PLAYER2 - self.stm[idx]
+        self.end = self.check_end()
@@ -0,0 +1,80 @@
+import io
+import os
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from c4.board import Board
+
+
+# a book entry: the hashkey of a position and the move to play in it,
+# positions are folded by symmetry so the move refers to the board with
+# the canonical key (the one with flip == False)
+ENTRY = np.dtype([('key', '<u8'), ('move', 'u1')])
+
+
+class OpeningBook(object):
+    """Opening book stored in a sorted binary file of ENTRY records
+
+    The file is memory mapped and searched with a binary search, so only
+    the pages touched by the lookups are read from the disk.
+
+    """
+    def __init__(self, path):
+        if os.path.getsize(path):
+            entries = np.memmap(path, dtype=ENTRY, mode='r')
+        else:
+            entries = np.zeros(0, dtype=ENTRY)
+        self._keys = entries['key']
+        self._moves = entries['move']
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, board):
+        """Returns the book move for board or None if it isn't in the book"""
+
+        key, flip = board.hashkey()
+        key = np.uint64(key)
+        i = self._keys.searchsorted(key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return None
+
+        move = int(self._moves[i])
+        if flip:
+            move = 6 - move
+        return move
+
+
+def generate_book(engine, maxply, path, verbose=False):
+    """Writes a book with the moves chosen by engine
+
+    All the positions with up to maxply pieces are searched, symmetric
+    positions only once. Returns the number of entries.
+
+    """
+    book = {}
+    pending = [Board()]
+    while pending:
+        board = pending.pop()
+        if board.end is not None or board.ply > maxply:
+            continue
+
+        key, flip = board.hashkey()
+        if key in book:
+            continue
+
+        if verbose:
+            move = engine.choose(board)
+        else:
+            with redirect_stdout(io.StringIO()):
+                move = engine.choose(board)
+        book[key] = 6 - move if flip else move
+
+        pending.extend(board.move(m) for m in board.moves())
+
+    entries = np.zeros(len(book), dtype=ENTRY)
+    entries['key'] = sorted(book)
+    entries['move'] = [book[k] for k in entries['key'].tolist()]
+    entries.tofile(path)
+    return len(entries)
@@ -1,4 +1,7 @@
+import weakref
+from array import array
 from collections import namedtuple, OrderedDict
+from multiprocessing.shared_memory import SharedMemory
 
 from c4.evaluate import INF
 
@@ -15,6 +18,16 @@ class Cache(object):
         self._maxitems = maxitems
         self._cache = OrderedDict()
 
+    def _store(self, key, entry):
+        self._cache.pop(key, None)
+        self._cache[key] = entry
+
+        if len(self._cache) > self._maxitems:
+            self._cache.popitem(last=False)
+
+    def _load(self, key):
+        return self._cache.get(key)
+
     def put(self, board, moves, depth, ply, score, alpha=-INF, beta=INF):
         key, flip = board.hashkey()
         if moves:
@@ -35,20 +48,14 @@ class Cache(object):
         else:
             assert False
 
-        entry = Entry(move, depth, int(score), state)
-        self._cache.pop(key, None)
-        self._cache[key] = entry
-
-        if len(self._cache) > self._maxitems:
-            self._cache.popitem(last=False)
+        self._store(key, Entry(move, depth, int(score), state))
 
     def lookup(self, board, depth, ply, alpha=-INF, beta=INF):
         key, flip = board.hashkey()
-        if key not in self._cache:
+        entry = self._load(key)
+        if entry is None:
             return False, None, None
 
-        entry = self._cache[key]
-
         hit = False
         if entry.depth == -1:
             hit = True
@@ -71,3 +78,105 @@ class Cache(object):
             score = None
 
         return hit, move, score
+
+
+class ArrayCache(Cache):
+    """Fixed size transposition table
+
+    The table is preallocated in a buffer of 64 bit words, each entry is a
+    word with the key and a word with the packed move, depth, bound and
+    score. Entries are grouped in buckets of two: the first slot keeps the
+    deepest search, the second one is always replaced.
+
+    The key word holds key ^ data and only the slots with data are in use,
+    so the key 0 of the empty board doesn't match an empty slot. An entry
+    that is half overwritten doesn't match its key either, so the table can
+    be shared without locks (see SharedArrayCache).
+
+    """
+    STATES = [Cache.EXACT, Cache.UPPERBOUND, Cache.LOWERBOUND]
+    NOMOVE = 7
+
+    def __init__(self, megabytes=16):
+        self._nbuckets = max(1, int(megabytes * 2**20) // 32)
+        self._table = array('Q', bytes(self._nbuckets * 32))
+
+    def __len__(self):
+        return sum(1 for k in self._table[1::2] if k)
+
+    @classmethod
+    def pack(cls, entry):
+        move = cls.NOMOVE if entry.move is None else int(entry.move)
+        return ((entry.score + 0x8000) |
+                (entry.depth + 1) << 16 |
+                move << 24 |
+                cls.STATES.index(entry.state) << 27)
+
+    @classmethod
+    def unpack(cls, data):
+        move = (data >> 24) & 0x7
+        if move == cls.NOMOVE:
+            move = None
+        return Entry(move,
+                     ((data >> 16) & 0xff) - 1,
+                     (data & 0xffff) - 0x8000,
+                     cls.STATES[(data >> 27) & 0x3])
+
+    def _store(self, key, entry):
+        table = self._table
+        i = (key % self._nbuckets) * 4
+        data = self.pack(entry)
+
+        # depth preferred slot, the empty slot has depth -1
+        if ((table[i+1] and table[i] ^ table[i+1] == key) or
+                entry.depth >= ((table[i+1] >> 16) & 0xff) - 1):
+            table[i] = key ^ data
+            table[i+1] = data
+        else:
+            table[i+2] = key ^ data
+            table[i+3] = data
+
+    def _load(self, key):
+        table = self._table
+        i = (key % self._nbuckets) * 4
+        # data is never 0 for a stored entry, so empty slots don't match
+        data = table[i+1]
+        if data and table[i] ^ data == key:
+            return self.unpack(data)
+        data = table[i+3]
+        if data and table[i+2] ^ data == key:
+            return self.unpack(data)
+        return None
+
+
+def _release(shm, table, unlink):
+    table.release()
+    shm.close()
+    if unlink:
+        shm.unlink()
+
+
+class SharedArrayCache(ArrayCache):
+    """ArrayCache allocated in shared memory
+
+    The table is shared by all the processes that get a copy of the object
+    (pickled copies attach to the same memory). The process that created
+    the table frees it when the object is collected.
+
+    """
+    def __init__(self, megabytes=16):
+        self._nbuckets = max(1, int(megabytes * 2**20) // 32)
+        self._attach(SharedMemory(create=True, size=self._nbuckets * 32),
+                     True)
+
+    def _attach(self, shm, owner):
+        self._shm = shm
+        self._table = shm.buf.cast('Q')
+        weakref.finalize(self, _release, shm, self._table, owner)
+
+    def __getstate__(self):
+        return {'name': self._shm.name, 'nbuckets': self._nbuckets}
+
+    def __setstate__(self, state):
+        self._nbuckets = state['nbuckets']
+        self._attach(SharedMemory(name=state['name']), False)
@@ -5,6 +5,11 @@ from c4.engine.mcts import MonteCarloTreeSearch
 from c4.engine.negamax import NegamaxEngine
 from c4.engine.alphabeta import AlphaBetaEngine, ABCachedEngine, ABDeepEngine
 from c4.engine.pvs import PVSEngine, PVSCachedEngine, PVSDeepEngine
+from c4.engine.mtdf import MTDfEngine
+from c4.engine.solver import SolverEngine
+from c4.engine.book import BookEngine
+from c4.engine.smp import LazySMPEngine
+from c4.engine.parallel import ABParallelEngine, PVSParallelEngine
 
 
 __all__ = ['Engine',
@@ -18,4 +23,10 @@ __all__ = ['Engine',
            'ABDeepEngine',
            'PVSEngine',
            'PVSCachedEngine',
-           'PVSDeepEngine']
+           'PVSDeepEngine',
+           'MTDfEngine',
+           'SolverEngine',
+           'BookEngine',
+           'LazySMPEngine',
+           'ABParallelEngine',
+           'PVSParallelEngine']
@@ -9,17 +9,23 @@ class AlphaBetaEngine(NegamaxEngine):
     FORMAT_STAT = (
         'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
         'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
-        'leaves: {leaves}, draws: {draws}, mates: {mates}'
+        'leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
         )
 
-    def __init__(self, maxdepth=4, ordering='seq'):
-        super(AlphaBetaEngine, self).__init__(maxdepth)
-        self.moveorder = MoveOrder(ordering).order
+    def __init__(self, maxdepth=4, ordering='seq', tactics=True):
+        super(AlphaBetaEngine, self).__init__(maxdepth, tactics)
+        self._moveorder = MoveOrder(ordering)
+        self.moveorder = self._moveorder.order
 
     def initcnt(self):
         super(AlphaBetaEngine, self).initcnt()
         self._counters['betacuts'] = 0
 
+    def choose(self, board):
+        self._moveorder.age()
+        return super(AlphaBetaEngine, self).choose(board)
+
     def search(self, board, depth, ply=1, alpha=-INF, beta=INF, hint=None):
         self.inc('nodes')
 
@@ -30,11 +36,20 @@ class AlphaBetaEngine(NegamaxEngine):
             self.inc('leaves')
             return [], self.evaluate(board)
 
+        moves, result = self.tactics(board, ply)
+        if result is not None:
+            return result
+        if hint not in moves:
+            hint = None
+
+        # fail soft: the score can be outside of the window
         bestmove = []
-        bestscore = alpha
-        for m in self.moveorder(board, board.moves(), hint):
-            nextmoves, score = self.search(board.move(m), depth-1, ply+1,
-                                           -beta, -bestscore)
+        bestscore = -INF
+        for m in self.moveorder(board, moves, hint, ply):
+            self.makemove(board, m)
+            nextmoves, score = self.search(board, depth-1, ply+1,
+                                           -beta, -max(alpha, bestscore))
+            self.unmakemove(board)
             score = -score
             if score > bestscore:
                 bestscore = score
@@ -44,6 +59,7 @@ class AlphaBetaEngine(NegamaxEngine):
 
             if bestscore >= beta:
                 self.inc('betacuts')
+                self._moveorder.cutoff(board, m, depth, ply)
                 break
 
         return bestmove, bestscore
@@ -56,7 +72,8 @@ class ABCachedEngine(CachedEngineMixin, AlphaBetaEngine):
     FORMAT_STAT = (
         'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
         'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
-        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}'
+        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
         )
 
     def initcnt(self):
@@ -71,8 +88,10 @@ class ABDeepEngine(CachedEngineMixin, IterativeDeepeningEngineMixin,
                    AlphaBetaEngine):
     FORMAT_STAT = (
         '[depth: {depth}] score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
-        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
-        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}'
+        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}, ' +
+        'researches: {researches}\n' +
+        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
         )
 
     def initcnt(self):
@@ -1,3 +1,13 @@
 class Engine(object):
     def choose(self, board):
         raise NotImplemented
+
+    def ponder(self, board):
+        """Called with the position after our move, the engine may think
+        on it while the opponent chooses its move"""
+
+    def stop_pondering(self):
+        """Stops the thinking started by ponder()"""
+
+    def close(self):
+        """Releases the worker processes of the engine, if any"""
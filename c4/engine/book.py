@@ -0,0 +1,28 @@
+from c4.engine.base import Engine
+
+
+class BookEngine(Engine):
+    """Plays the moves of an opening book, then lets engine search"""
+
+    def __init__(self, engine, book):
+        self.engine = engine
+        self.book = book
+
+    def choose(self, board):
+        self.engine.stop_pondering()
+        move = self.book.lookup(board)
+        if move is not None:
+            return move
+        return self.engine.choose(board)
+
+    def ponder(self, board):
+        self.engine.ponder(board)
+
+    def stop_pondering(self):
+        self.engine.stop_pondering()
+
+    def close(self):
+        self.engine.close()
+
+    def __str__(self):
+        return str(self.engine)
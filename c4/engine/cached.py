@@ -1,11 +1,25 @@
 from c4.evaluate import INF
-from c4.cache import Cache
+from c4.cache import Cache, ArrayCache, SharedArrayCache
 
 
 class CachedEngineMixin(object):
-    def __init__(self, *args, **kwargs):
+    """Adds a transposition table to a negamax derived engine
+
+    cache selects the table: 'lru' is a Cache of cachesize entries
+    (default 50000), 'array' is an ArrayCache of cachesize megabytes
+    (default 16) and 'shared' the same table in shared memory.
+
+    """
+    def __init__(self, *args, cache='lru', cachesize=None, **kwargs):
         super(CachedEngineMixin, self).__init__(*args, **kwargs)
-        self._cache = Cache()
+        if cache == 'lru':
+            self._cache = Cache(int(cachesize or 50000))
+        elif cache == 'array':
+            self._cache = ArrayCache(float(cachesize or 16))
+        elif cache == 'shared':
+            self._cache = SharedArrayCache(float(cachesize or 16))
+        else:
+            raise ValueError('Unknown cache %s' % cache)
 
     def search(self, board, depth, ply=1, alpha=-INF, beta=INF):
         hit, move, score = self._cache.lookup(board, depth, ply, alpha, beta)
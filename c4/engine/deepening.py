@@ -1,8 +1,147 @@
+import time
+
+from c4.evaluate import INF
+
+
+class SearchAborted(Exception):
+    pass
+
+
 class IterativeDeepeningEngineMixin(object):
+    """Searches with increasing depth until maxdepth or the time is over
+
+    movetime limits the seconds spent on each move. clock and increment
+    describe a time control: the engine has clock seconds for the rest of
+    the game and gains increment seconds after each move.
+
+    A new depth isn't started when it is expected to overrun the budget
+    (its time is estimated from the growth of the previous iterations),
+    an iteration that is still running at the deadline is aborted and the
+    move of the last completed depth is played.
+
+    With aspiration each depth is searched with a window of +/- aspiration
+    around the score of the previous depth, the window is widened and the
+    position searched again when the score falls outside. The principal
+    variation of the previous depth is always searched first.
+
+    """
+    def __init__(self, *args, movetime=None, clock=None, increment=0,
+                 aspiration=0, **kwargs):
+        super(IterativeDeepeningEngineMixin, self).__init__(*args, **kwargs)
+        self._movetime = float(movetime) if movetime is not None else None
+        self._clock = float(clock) if clock is not None else None
+        self._increment = float(increment)
+        self._aspiration = int(aspiration)
+        self._deadline = None
+        self._pvmoves = {}
+
+    def initcnt(self):
+        super(IterativeDeepeningEngineMixin, self).initcnt()
+        self._counters['researches'] = 0
+
+    def budget(self, board):
+        """Seconds to spend on the next move, None if there is no limit"""
+
+        budget = self._movetime
+        if self._clock is not None:
+            # share the clock between the moves we might still play
+            movesleft = (6 * 7 - board.ply + 1) // 2
+            share = min(self._clock / max(1, movesleft) + self._increment,
+                        self._clock)
+            budget = share if budget is None else min(budget, share)
+        return budget
+
+    def aborted(self):
+        return self._deadline is not None and time.time() >= self._deadline
+
+    def seedpv(self, board, pv):
+        """Remembers the moves of pv to search them first"""
+
+        self._pvmoves = {}
+        board = board.copy()
+        for m in pv:
+            key, flip = board.hashkey()
+            self._pvmoves[key] = 6 - m if flip else m
+            board.push(m)
+
+    def search(self, board, depth, ply=1, alpha=-INF, beta=INF, hint=None):
+        if not self._counters['nodes'] & 0x3ff and self.aborted():
+            raise SearchAborted()
+
+        if self._pvmoves:
+            key, flip = board.hashkey()
+            move = self._pvmoves.get(key)
+            if move is not None:
+                hint = 6 - move if flip else move
+
+        return super(IterativeDeepeningEngineMixin, self).search(
+            board, depth, ply, alpha, beta, hint)
+
+    def searchroot(self, board, depth, guess=None):
+        """Searches the root with an aspiration window around guess"""
+
+        delta = self._aspiration
+        if not delta or guess is None or abs(guess) >= INF - 6 * 7:
+            return self.search(board, depth)
+
+        alpha = guess - delta
+        beta = guess + delta
+        while True:
+            pv, score = self.search(board, depth, 1, alpha, beta)
+            if alpha < score < beta:
+                return pv, score
+            if alpha <= -INF and beta >= INF:
+                return pv, score
+
+            self.inc('researches')
+            delta *= 2
+            if score <= alpha:
+                alpha = max(-INF, score - delta)
+            else:
+                beta = min(INF, score + delta)
+
     def choose(self, board):
+        start = time.time()
+        budget = self.budget(board)
+        self._evaluator.reset(board)
+        self._moveorder.age()
+        board = board.copy()
+
+        # the first depth is never aborted, so there is always a move
+        self._deadline = None
+        self._pvmoves = {}
+        lasttime = None
+        score = None
+        total = 0
         for depth in range(1, self._maxdepth+1):
+            t = time.time()
             self.initcnt()
             self._counters['depth'] = depth
-            pv, score = self.search(board, depth)
+            try:
+                pv, score = self.searchroot(board, depth, score)
+            except SearchAborted:
+                print('[depth: %d] aborted after %0.3fs' %
+                      (depth, time.time() - t))
+                break
+            finally:
+                total += self._counters['nodes']
             self.showstats(pv, score)
+            self.seedpv(board, pv)
+
+            if budget is None:
+                continue
+            self._deadline = start + budget
+
+            elapsed = time.time() - t
+            if lasttime:
+                # the next iteration grows with the observed branching factor
+                if time.time() + elapsed * elapsed / lasttime > self._deadline:
+                    break
+            lasttime = elapsed
+
+        print('total nodes: %d' % total)
+        self._deadline = None
+        self._pvmoves = {}
+        if self._clock is not None:
+            self._clock += self._increment - (time.time() - start)
         return pv[0]
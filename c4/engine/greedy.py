@@ -1,6 +1,6 @@
 import numpy as np
 
-from c4.evaldiff import evaldiff
+from c4.evaldiff import evaldiff_all
 from c4.engine.base import Engine
 from c4.evaluate import Evaluator, INF
 
@@ -11,18 +11,11 @@ class GreedyEngine(Engine):
         self.evaluate = self._evaluator.evaluate
 
     def choose(self, board):
-        moves = board.moves()
-        m = moves[0]
-        moves = moves[1:]
+        moves, scores = self._evaluator.evaluate_children(board)
+        best = (-scores).argmax()
 
-        bestmove = m
-        bestscore = -self.evaluate(board.move(m))
-
-        for m in moves:
-            score = -self.evaluate(board.move(m))
-            if score > bestscore:
-                bestmove = m
-                bestscore = score
+        bestmove = moves[best]
+        bestscore = -scores[best]
 
         print('Bestscore:', bestscore)
         return bestmove
@@ -41,14 +34,13 @@ class WeightedGreedyEngine(Engine):
         self.evaluate = self._evaluator.evaluate
 
     def choose(self, board):
-        moves = board.moves()
+        moves, scores = evaldiff_all(board)
 
         # forced move?
         if len(moves) < 2:
             return moves[0]
 
         # winning move or threat blocking?
-        scores = [evaldiff(board, m) for m in moves]
         if max(scores) >= INF - 1:
             return max(zip(scores, moves))[1]
 
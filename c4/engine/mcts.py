@@ -1,64 +1,613 @@
 import math
 import random
-from collections import defaultdict
+import sys
+import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
 
-from c4.evaluate import DRAW
+import numpy as np
+
+from c4.board import BoardBatch, ROWS
+from c4.evaluate import DRAW, INF
+from c4.evaldiff import evaldiff_batch
 from c4.engine.base import Engine
+from c4.engine.pool import WorkerPoolEngineMixin
 from c4.engine.greedy import WeightedGreedyEngine
 
 
-class MonteCarloTreeSearch(Engine):
-    def __init__(self, simulations=1000, C=1/math.sqrt(2)):
+NOCHILD = -1
+
+# proven values of a node, for the player who moved into it
+UNPROVEN = 0
+PROVEN_WIN = 1
+PROVEN_LOSS = 2
+PROVEN_DRAW = 3
+# result of a proven node for the side to move, indexed by proven value
+PROVEN_RESULT = [None, 0, 1, 0.5]
+PROVEN_NAMES = ['', ' proven win', ' proven loss', ' proven draw']
+
+
+_engine = None
+
+
+def _init_worker(C, maxnodes, batch, rave):
+    global _engine
+    # the workers are forked with the same random state
+    random.seed()
+    np.random.seed()
+    _engine = MonteCarloTreeSearch(0, C, maxnodes, batch=batch, rave=rave)
+
+
+def _search_root(board, simulations, C, deadline):
+    _engine.reroot(board)
+    _engine.settimer(deadline)
+    depth = _engine.search(board, simulations, C)
+    return _engine.rootstats() + (depth,)
+
+
+def _simulate(board):
+    return _engine.result(board)
+
+
+def _playout(board):
+    result, final = _engine.playout(board)
+    return result, final.to_array()
+
+
+class MonteCarloTreeSearch(WorkerPoolEngineMixin, Engine):
+    """Monte Carlo Tree Search with UCT
+
+    The tree is kept in arrays indexed by node: visits, wins (of the
+    player who moved into the node), parent and the child for each column
+    (NOCHILD until it is expanded). After a move the subtree of the
+    position reached becomes the new root, so its simulations are reused,
+    and the rest of the tree is dropped.
+
+    Nodes are also marked as proven wins, losses or draws (MCTS-Solver):
+    the end of the game and the positions where the side to move wins at
+    once are proven when they are expanded, the proofs propagate to the
+    parents during the backup. Proven nodes aren't simulated, proven
+    losses aren't selected and the search stops when the root is proven.
+
+    The tree holds at most maxnodes nodes: when it is full the least
+    visited leaves are evicted.
+
+    With workers > 1 the simulations run on several processes. parallel
+    selects how: 'root' grows a tree on each process and sums the root
+    statistics, 'tree' keeps a single tree here and sends the simulations
+    to the workers (with virtual loss). The workers are started by the
+    first search and kept until close().
+
+    With batch > 1 the search selects batch leaves at a time (with virtual
+    loss) and plays their playouts together on a BoardBatch, with the
+    policy of WeightedGreedyEngine computed for all the boards at once.
+    Tree parallelization plays the playouts one by one.
+
+    With rave > 0 the selection blends the win rate of each move with its
+    all-moves-as-first (AMAF) win rate: every node counts the simulations
+    through it where the side to move played, at any later time, on the
+    square that a move in each column would take now. rave is the number
+    of visits at which both rates weigh the same (RAVE equivalence), the
+    AMAF rate fades as the move gets its own visits.
+
+    With movetime the search runs for movetime seconds instead of a fixed
+    number of simulations, and stops earlier when the most visited root
+    move can't be overtaken by the simulations that fit in the time left
+    (estimated from the rate so far).
+
+    With ponder the engine keeps searching on a background thread after
+    its move, while the opponent thinks, and the next search starts from
+    the statistics gathered. Pondering searches on this process only.
+
+    """
+    CAPACITY = 4096
+
+    def __init__(self, simulations=1000, C=1/math.sqrt(2), maxnodes=200000,
+                 workers=1, parallel='root', batch=1, rave=0, movetime=None,
+                 ponder=False):
         super(MonteCarloTreeSearch, self).__init__()
         self.simulations = int(simulations)
         self.C = float(C)
+        self._workers = int(workers)
+        if parallel not in ('root', 'tree'):
+            raise ValueError('Unknown parallelization %s' % parallel)
+        self._parallel = parallel
+        self._batch = max(1, min(int(batch), int(maxnodes) // 2))
+        self._rave = float(rave)
+        self._movetime = float(movetime) if movetime is not None else None
+        self._ponder = bool(int(ponder))
+        self._deadline = None
+        self._start = None
+        self._startvisits = 0
+        self._halt = threading.Event()
+        self._pondering = None
         self.simulation_engine = WeightedGreedyEngine(False)
-        self._stats = defaultdict(lambda: [0, 0])
+        self._maxnodes = max(2, int(maxnodes))
+        capacity = min(self.CAPACITY, self._maxnodes)
+        self._visits = np.zeros(capacity, dtype=np.int64)
+        self._wins = np.zeros(capacity)
+        self._parent = np.zeros(capacity, dtype=np.int32)
+        self._children = np.zeros((capacity, 7), dtype=np.int32)
+        self._nmoves = np.zeros(capacity, dtype=np.int8)
+        self._proven = np.zeros(capacity, dtype=np.int8)
+        # AMAF statistics and the free row of each column, empty without rave
+        width = 7 if self._rave else 0
+        self._amaf_visits = np.zeros((capacity, width), dtype=np.int64)
+        self._amaf_wins = np.zeros((capacity, width))
+        self._rows = np.zeros((capacity, width), dtype=np.int8)
+        self._size = 0
+        self._root = None
+        self._rootboard = None
+        self._evicted = 0
+
+    def poolargs(self):
+        # with root parallelization this process is a worker too
+        workers = self._workers
+        if self._parallel == 'root':
+            workers -= 1
+        return workers, _init_worker, (self.C, self._maxnodes, self._batch,
+                                       self._rave)
+
+    @property
+    def nbytes(self):
+        """Memory used by the tree arrays"""
+
+        return (self._visits.nbytes + self._wins.nbytes +
+                self._parent.nbytes + self._children.nbytes +
+                self._nmoves.nbytes + self._proven.nbytes +
+                self._amaf_visits.nbytes + self._amaf_wins.nbytes +
+                self._rows.nbytes)
+
+    def newnode(self, parent, board):
+        """Allocates a node for board without statistics and returns its
+        index"""
+
+        if self._size == len(self._visits):
+            capacity = min(2 * self._size, self._maxnodes)
+            self._visits = np.resize(self._visits, capacity)
+            self._wins = np.resize(self._wins, capacity)
+            self._parent = np.resize(self._parent, capacity)
+            self._children = np.resize(self._children, (capacity, 7))
+            self._nmoves = np.resize(self._nmoves, capacity)
+            self._proven = np.resize(self._proven, capacity)
+            width = self._rows.shape[1]
+            self._amaf_visits = np.resize(self._amaf_visits, (capacity, width))
+            self._amaf_wins = np.resize(self._amaf_wins, (capacity, width))
+            self._rows = np.resize(self._rows, (capacity, width))
+
+        i = self._size
+        self._size += 1
+        self._visits[i] = 0
+        self._wins[i] = 0
+        self._parent[i] = parent
+        self._children[i] = NOCHILD
+        if board.end is None:
+            self._nmoves[i] = len(board.moves())
+            self._proven[i] = PROVEN_LOSS if board.winning_moves() else UNPROVEN
+        else:
+            self._nmoves[i] = 0
+            self._proven[i] = PROVEN_DRAW if board.end == DRAW else PROVEN_WIN
+        if self._rave:
+            self._amaf_visits[i] = 0
+            self._amaf_wins[i] = 0
+            self._rows[i] = [ROWS if r is None else r
+                             for r in map(board.freerow, range(7))]
+        return i
+
+    def reroot(self, board):
+        """Makes board the root, keeping its subtree if it is in the tree
+
+        board is searched among the root and the positions one and two
+        moves after it (our last move and the opponent's reply).
+
+        """
+        root = None
+        if self._rootboard is not None:
+            key = board.hashkey()
+            pending = [(self._root, self._rootboard, 0)]
+            while pending:
+                node, b, plies = pending.pop()
+                if b.hashkey() == key:
+                    root = node
+                    break
+                if plies == 2:
+                    continue
+                for m in np.flatnonzero(self._children[node] != NOCHILD):
+                    pending.append((self._children[node, m], b.move(m),
+                                    plies + 1))
+
+        if root is None:
+            self._size = 0
+            root = self.newnode(NOCHILD, board)
+        self._parent[root] = NOCHILD
+        # proven again from the children, so that the proof is in the tree
+        self._proven[root] = UNPROVEN
+        self._root = root
+        self._rootboard = board.copy()
+        self.compact()
+
+    def compact(self):
+        """Drops the nodes that can't be reached from the root
+
+        The subtree of the root is moved to the beginning of the arrays,
+        in breadth first order, so the root becomes the node 0.
+
+        """
+        children = self._children
+        keep = [np.array([self._root])]
+        frontier = keep[0]
+        while len(frontier):
+            frontier = children[frontier].ravel()
+            frontier = frontier[frontier != NOCHILD]
+            keep.append(frontier)
+        keep = np.concatenate(keep)
+
+        n = len(keep)
+        index = np.full(self._size, NOCHILD, dtype=np.int32)
+        index[keep] = np.arange(n)
+
+        self._visits[:n] = self._visits[keep]
+        self._wins[:n] = self._wins[keep]
+        self._nmoves[:n] = self._nmoves[keep]
+        self._proven[:n] = self._proven[keep]
+        self._amaf_visits[:n] = self._amaf_visits[keep]
+        self._amaf_wins[:n] = self._amaf_wins[keep]
+        self._rows[:n] = self._rows[keep]
+        self._parent[:n] = index[self._parent[keep]]
+        self._parent[0] = NOCHILD
+        kids = children[keep]
+        expanded = kids != NOCHILD
+        kids[expanded] = index[kids[expanded]]
+        children[:n] = kids
+        self._size = n
+        self._root = 0
+
+    def evict(self, count):
+        """Removes the count least visited leaves from the tree"""
+
+        size = self._size
+        leaves = np.flatnonzero((self._children[:size] == NOCHILD).all(1))
+        leaves = leaves[leaves != self._root]
+        if count < len(leaves):
+            least = np.argpartition(self._visits[leaves], count)[:count]
+            leaves = leaves[least]
+
+        parents = self._parent[leaves]
+        columns = (self._children[parents] == leaves[:, None]).argmax(1)
+        self._children[parents, columns] = NOCHILD
+        self._evicted += len(leaves)
+        self.compact()
+
+    def settimer(self, deadline):
+        """Makes the search stop at deadline (None for no time limit)"""
+
+        self._deadline = deadline
+        self._start = time.time()
+        self._startvisits = self._visits[self._root]
+
+    def stopped(self):
+        """True if the search has to stop before the next simulation"""
+
+        if self._halt.is_set():
+            return True
+        if self._deadline is None:
+            return False
+        now = time.time()
+        if now >= self._deadline:
+            return True
+
+        # the simulations we still expect to run can't change the best move
+        done = self._visits[self._root] - self._startvisits
+        if not done or now <= self._start:
+            return False
+        left = done * (self._deadline - now) / (now - self._start)
+        second, first = np.partition(self.rootstats()[0], -2)[-2:]
+        return first - second > left
+
+    def ponder(self, board):
+        if not self._ponder or board.end is not None:
+            return
+        self.stop_pondering()
+        self.reroot(board)
+        self._pondering = threading.Thread(
+            target=self.search, args=(board.copy(), sys.maxsize, self.C),
+            daemon=True)
+        self._pondering.start()
+
+    def stop_pondering(self):
+        if self._pondering is None:
+            return
+        self._halt.set()
+        self._pondering.join()
+        self._pondering = None
+        self._halt.clear()
 
     def choose(self, board):
-        stats, depth = self.search(board, self.simulations, self.C)
-        return self.select_best_move(stats, depth, board)
+        self.stop_pondering()
+        self.reroot(board)
+        reused = self._visits[self._root]
+        simulations = self.simulations
+        if self._movetime is None:
+            self.settimer(None)
+        else:
+            self.settimer(time.time() + self._movetime)
+            simulations = sys.maxsize
+
+        try:
+            if self._workers > 1 and self._parallel == 'root':
+                visits, wins, depth = self.search_root(board, simulations,
+                                                       self.C)
+            else:
+                if self._workers > 1:
+                    depth = self.search_tree(board, simulations, self.C)
+                else:
+                    depth = self.search(board, simulations, self.C)
+                visits, wins = self.rootstats()
+        finally:
+            self._deadline = None
+        print('Time: %0.3fs, reused simulations: %d' %
+              (time.time() - self._start, reused))
+        move = self.select_best_move(depth, board, visits, wins)
+        self.reroot(board.move(move))
+        return move
+
+    def rootstats(self):
+        """Returns the visits and the wins of the root moves by column"""
+
+        children = self._children[self._root]
+        expanded = children != NOCHILD
+        visits = np.zeros(7, dtype=np.int64)
+        wins = np.zeros(7)
+        visits[expanded] = self._visits[children[expanded]]
+        wins[expanded] = self._wins[children[expanded]]
+        return visits, wins
+
+    def select(self, board, C):
+        """Walks down the tree from the root, expanding one node
+
+        Returns the path of the nodes, the board of the last one and the
+        depth reached.
+
+        """
+        node = board.copy()
+        path = [self._root]
+
+        depth = 0
+        while not self._proven[path[-1]]:
+            depth += 1
+            move, select = self.select_next_move(path[-1], node, C)
+            node.push(move)
+            if select:
+                path.append(self._children[path[-1], move])
+            else:
+                child = self.newnode(path[-1], node)
+                self._children[path[-1], move] = child
+                path.append(child)
+                break
+
+        return path, node, depth
+
+    def backup(self, path, result, virtual=False, final=None):
+        """Propagates the result of a simulation (for the side to move at
+        the end of path) up to the root
+
+        virtual means that the visits were already counted when the
+        simulation was started (virtual loss). final is the position at the
+        end of the simulation, as Board.to_array(), for the AMAF statistics.
+
+        """
+        # the wins of each node are counted for the player who moved into it
+        path = np.array(path[::-1])
+        if not virtual:
+            self._visits[path] += 1
+        self._wins[path[0::2]] += 1 - result
+        self._wins[path[1::2]] += result
+        if final is not None:
+            self.amaf(path, result, final)
+
+    def amaf(self, path, result, final):
+        """Updates the AMAF statistics of the nodes of path (from the last
+        one up) with a simulation that ended in the position final
+
+        A square is never played twice, so the owner of each square at the
+        end tells who played it, the row of each column at the node tells
+        which square a move there takes.
+
+        """
+        rows = self._rows[path].astype(np.intp)
+        # the side to move at each node, from the number of pieces
+        plies = rows.sum(1) - self._rows[self._root].sum()
+        stm = self._rootboard.stm
+        stm = np.where(plies % 2 == 0, stm, 3 - stm)
+
+        # a full column has no square to take
+        final = np.hstack([final, np.zeros((7, 1), dtype=final.dtype)])
+        played = final[np.arange(7), rows] == stm[:, np.newaxis]
+
+        results = np.empty(len(path))
+        results[0::2] = result
+        results[1::2] = 1 - result
+        self._amaf_visits[path] += played
+        self._amaf_wins[path] += played * results[:, np.newaxis]
+
+    def prove(self, path):
+        """Marks the nodes of path proven by the proof of the last one"""
+
+        for node in reversed(path[:-1]):
+            children = self._children[node]
+            proven = self._proven[children[children != NOCHILD]]
+            if (proven == PROVEN_WIN).any():
+                # the side to move has a winning move
+                value = PROVEN_LOSS
+            elif len(proven) < self._nmoves[node] or not proven.all():
+                return
+            elif (proven == PROVEN_LOSS).all():
+                value = PROVEN_WIN
+            else:
+                value = PROVEN_DRAW
+            self._proven[node] = value
+
+    def result(self, board):
+        """Result of a simulation starting from board"""
+
+        if board.end is None:
+            return self.simulate(board)
+        elif board.end == 0:
+            return 0.5
+        else:
+            return 0
 
     def search(self, board, simulations, C):
-        stats = self._stats
-        root = board
+        """Runs the simulations from the root, returns the maximum depth"""
+
+        if self._batch > 1:
+            return self.search_batch(board, simulations, C)
+
         max_depth = 0
 
         for i in range(simulations):
-            node = root
-            states = []
-
-            # select leaf node
-            depth = 0
-            while node.end is None:
-                depth += 1
-                move, select = self.select_next_move(stats, node, C)
-                node = node.move(move)
-                states.append(node.hashkey()[0])
-
-                if not select:
-                    break
+            if self._proven[self._root] or self.stopped():
+                break
+            if self._size >= self._maxnodes:
+                self.evict(self._maxnodes // 4 or 1)
 
+            path, node, depth = self.select(board, C)
             max_depth = max(depth, max_depth)
-
-            # run simulation if not at the end of the game tree
-            if node.end is None:
-                result = self.simulate(node)
+            proven = self._proven[path[-1]]
+            if proven:
+                result, final = PROVEN_RESULT[proven], node
             else:
-                if node.end == 0:
-                    result = 0.5
+                result, final = self.playout(node)
+            self.backup(path, result,
+                        final=final.to_array() if self._rave else None)
+            if proven:
+                self.prove(path)
+
+        return max_depth
+
+    def search_batch(self, board, simulations, C):
+        """Runs the simulations batch at a time, returns the maximum depth
+
+        The leaves of a batch are selected one after the other, a virtual
+        loss on the pending paths spreads them over the tree.
+
+        """
+        max_depth = 0
+
+        for start in range(0, simulations, self._batch):
+            if self._proven[self._root] or self.stopped():
+                break
+            count = min(self._batch, simulations - start)
+            while self._size + count > self._maxnodes:
+                self.evict(max(count, self._maxnodes // 4))
+
+            paths = []
+            leaves = []
+            for i in range(count):
+                if self._proven[self._root]:
+                    break
+                path, node, depth = self.select(board, C)
+                max_depth = max(depth, max_depth)
+                proven = self._proven[path[-1]]
+                if proven:
+                    self.backup(path, PROVEN_RESULT[proven], final=(
+                        node.to_array() if self._rave else None))
+                    self.prove(path)
                 else:
-                    result = 0
+                    self._visits[path] += 1
+                    paths.append(path)
+                    leaves.append(node)
+
+            if leaves:
+                results, finals = self.simulate_batch(leaves, True)
+                for i, path in enumerate(paths):
+                    self.backup(path, results[i], True,
+                                finals[i] if self._rave else None)
+
+        return max_depth
+
+    def search_root(self, board, simulations, C):
+        """Root parallelization: the workers grow independent trees
 
-            # propagate results
-            for state in reversed(states):
-                result = 1 - result
-                stats[state][0] += 1
-                stats[state][1] += result
+        The simulations are shared between this process and the workers,
+        the statistics of the root moves of all the trees are summed.
+        Returns the visits and the wins of the root moves and the maximum
+        depth.
 
-        return stats, max_depth
+        """
+        share = simulations // self._workers
+        pool = self.pool()
+        futures = [pool.submit(_search_root, board, share, C, self._deadline)
+                   for _ in range(self._workers - 1)]
+        depth = self.search(board,
+                            simulations - share * (self._workers - 1), C)
+        visits, wins = self.rootstats()
+        for f in futures:
+            v, w, d = f.result()
+            visits += v
+            wins += w
+            depth = max(depth, d)
+
+        return visits, wins, depth
+
+    def search_tree(self, board, simulations, C):
+        """Tree parallelization: the simulations run on the workers
+
+        Up to workers simulations are pending at any time. The nodes on the
+        path of a pending simulation count it as a loss (virtual loss), so
+        the next selections explore other paths, the result replaces the
+        loss when the simulation completes. Returns the maximum depth.
+
+        """
+        max_depth = 0
+        pending = {}
+
+        def complete(done):
+            for f in done:
+                path = pending.pop(f)
+                if self._rave:
+                    result, final = f.result()
+                    self.backup(path, result, True, final)
+                else:
+                    self.backup(path, f.result(), True)
+
+        pool = self.pool()
+        for i in range(simulations):
+            if self._proven[self._root] or self.stopped():
+                break
+            if len(pending) >= self._workers:
+                complete(wait(pending, return_when=FIRST_COMPLETED)[0])
+
+            # the nodes on pending paths can't be moved
+            if self._size >= self._maxnodes:
+                complete(wait(pending)[0])
+                self.evict(self._maxnodes // 4 or 1)
+
+            path, node, depth = self.select(board, C)
+            max_depth = max(depth, max_depth)
+            proven = self._proven[path[-1]]
+            if proven:
+                self.backup(path, PROVEN_RESULT[proven], final=(
+                    node.to_array() if self._rave else None))
+                self.prove(path)
+                continue
+
+            # virtual loss: a visit without wins for all the path
+            self._visits[path] += 1
+            simulate = _playout if self._rave else _simulate
+            pending[pool.submit(simulate, node)] = path
+
+        complete(wait(pending)[0])
+
+        return max_depth
 
     def simulate(self, board):
+        return self.playout(board)[0]
+
+    def playout(self, board):
+        """Plays a simulation from board, returns the result for the side
+        to move and the final board"""
+
         engine = self.simulation_engine
         node = board
         while node.end is None:
@@ -66,55 +615,129 @@ class MonteCarloTreeSearch(Engine):
             node = node.move(m)
 
         if node.end == DRAW:
-            return 0.5
+            return 0.5, node
         elif node.end == board.stm:
-            return 1
+            return 1, node
         else:
-            return 0
+            return 0, node
 
-    def select_next_move(self, stats, board, C):
-        """Select the next state and consider if it should be expanded"""
+    def simulate_batch(self, boards, final=False):
+        """Plays a simulation from each board, all at the same time
 
-        bestscore = None
-        bestmove = None
+        The moves are chosen as WeightedGreedyEngine does: a forced or a
+        winning (or blocking) move if there is one, otherwise at random
+        with evaldiff + 1 as weight. Returns the results for the side to
+        move of each board and, with final, the (n, cols, rows) array of
+        the final positions.
 
-        children = [(m, stats[board.move(m).hashkey()[0]])
-                    for m in board.moves()]
-        total_n = sum(x[0] for (_, x) in children)
+        """
+        batch = BoardBatch.from_boards(boards)
+        stm = batch.stm.copy()
+        end = batch.end.copy()
+        finals = batch.pos.copy() if final else None
 
-        for child_move, child_stat in children:
-            n, w = child_stat
-            if n == 0:
-                return child_move, False
-            else:
-                score = (w / n) + C * math.sqrt(2 * math.log(total_n) / n)
-                if bestscore is None or score > bestscore:
-                    bestscore = score
-                    bestmove = child_move
+        # the boards still playing, the finished ones are dropped
+        alive = np.flatnonzero(end == BoardBatch.PLAYING)
+        batch = BoardBatch(pos=batch.pos[alive], stm=batch.stm[alive])
+        while len(alive):
+            n = len(alive)
+            legal = batch.legal()
+            scores = np.where(legal, evaldiff_batch(batch), -1)
 
-        assert bestmove is not None
-        return bestmove, True
+            # the last column with the best score, as max(zip(scores, moves))
+            best = scores.max(1)
+            greedy = 6 - (scores[:, ::-1] == best[:, np.newaxis]).argmax(1)
+            forced = (legal.sum(1) < 2) | (best >= INF - 1)
+
+            weights = np.where(legal, scores + 1, 0).astype(float)
+            total = weights.sum(1)
+            uniform = total == 0
+            weights[uniform] = legal[uniform]
+            total[uniform] = legal[uniform].sum(1)
+            threshold = np.random.random(n) * total
+            weighted = (weights.cumsum(1) > threshold[:, np.newaxis]).argmax(1)
+
+            batch.push(np.where(forced, greedy, weighted))
+
+            done = batch.end != BoardBatch.PLAYING
+            if done.any():
+                end[alive[done]] = batch.end[done]
+                if final:
+                    finals[alive[done]] = batch.pos[done]
+                alive = alive[~done]
+                batch = BoardBatch(pos=batch.pos[~done],
+                                   stm=batch.stm[~done])
+
+        results = np.where(end == stm, 1.0, 0.0)
+        results[end == DRAW] = 0.5
+        if final:
+            return results, finals
+        return results
 
-    def select_best_move(self, stats, depth, board):
+    def select_next_move(self, node, board, C):
+        """Select the next state and consider if it should be expanded"""
+
+        moves = board.moves()
+        children = self._children[node, moves]
+        for m, child in zip(moves, children):
+            if child == NOCHILD:
+                return m, False
+
+        # a proven win is always played, proven losses never
+        proven = self._proven[children]
+        if (proven == PROVEN_WIN).any():
+            return moves[int((proven == PROVEN_WIN).argmax())], True
+
+        n = self._visits[children]
+        w = self._wins[children]
+        value = w / n
+        if self._rave:
+            amaf_n = self._amaf_visits[node, moves]
+            amaf_w = self._amaf_wins[node, moves]
+            amaf = np.where(amaf_n > 0, amaf_w / np.maximum(amaf_n, 1), value)
+            beta = np.sqrt(self._rave / (3 * n + self._rave))
+            value = (1 - beta) * value + beta * amaf
+        scores = value + C * np.sqrt(2 * math.log(n.sum()) / n)
+        scores[proven == PROVEN_LOSS] = -np.inf
+        return moves[int(scores.argmax())], True
+
+    def select_best_move(self, depth, board, visits, wins):
         """Select the best move at the end of the Monte Carlo tree search"""
 
-        bestscore = 0
+        bestscore = None
         bestmove = None
         total_n = 0
         moves = board.moves()
 
+        children = self._children[self._root]
+        proven = np.where(children != NOCHILD, self._proven[children],
+                          UNPROVEN)
+        # proven wins first and proven losses last, then the most visited
+        rank = {UNPROVEN: 1, PROVEN_WIN: 2, PROVEN_LOSS: 0, PROVEN_DRAW: 1}
+
         for m in moves:
-            n, w = stats[board.move(m).hashkey()[0]]
+            n, w = visits[m], wins[m]
             total_n += n
-            print('Move %d score: %d/%d (%0.1f%%)' % (m+1, w, n, w/n*100))
-            if n > bestscore or (n == bestscore and random.random() <= 0.5):
+            print('Move %d score: %d/%d (%0.1f%%)%s' %
+                  (m+1, w, n, w/n*100 if n else 0,
+                   PROVEN_NAMES[proven[m]]))
+            score = (rank[proven[m]], n)
+            if (bestscore is None or score > bestscore or
+                    (score == bestscore and random.random() <= 0.5)):
                 bestmove = m
-                bestscore = n
+                bestscore = score
         assert bestmove is not None
 
-        print('Maximum depth: %d, Total simulations: %d' % (depth, total_n))
+        print('Maximum depth: %d, Total simulations: %d, workers: %d' %
+              (depth, total_n, self._workers))
+        print('Tree nodes: %d/%d, memory: %0.1f MB, evicted: %d, proven: %d' %
+              (self._size, self._maxnodes, self.nbytes / 2**20,
+               self._evicted, np.count_nonzero(self._proven[:self._size])))
 
         return bestmove
 
     def __str__(self):
+        if self._rave:
+            return 'MCTS(%s, %0.2f, rave %g)' % (self.simulations, self.C,
+                                                 self._rave)
         return 'MCTS(%s, %0.2f)' % (self.simulations, self.C)
@@ -0,0 +1,55 @@
+from c4.evaluate import INF
+from c4.engine.alphabeta import AlphaBetaEngine
+from c4.engine.cached import CachedEngineMixin
+from c4.engine.deepening import IterativeDeepeningEngineMixin
+
+
+class MTDfEngine(CachedEngineMixin, IterativeDeepeningEngineMixin,
+                 AlphaBetaEngine):
+    """MTD(f) with Iterative Deepening
+
+    Every depth is searched with a sequence of zero window alpha-beta
+    searches that move the bounds of the score until they meet, starting
+    from the score of two depths before (the evaluation swings between odd
+    and even depths). The transposition table keeps the bounds found by
+    each pass, so the passes after the first one are cheap.
+
+    """
+    FORMAT_STAT = (
+        '[depth: {depth}] score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
+        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}, ' +
+        'passes: {passes}\n' +
+        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
+        )
+
+    def initcnt(self):
+        super(MTDfEngine, self).initcnt()
+        self._counters['hits'] = 0
+        self._counters['passes'] = 0
+
+    def searchroot(self, board, depth, guess=None):
+        if depth == 1:
+            self._scores = {}
+        score = self._scores.get(depth - 2, 0 if guess is None else guess)
+        lower = -INF
+        upper = INF
+        pv = None
+        while lower < upper:
+            beta = max(score, lower + 1)
+            self.inc('passes')
+            moves, score = self.search(board, depth, 1, beta - 1, beta)
+            if score < beta:
+                upper = score
+            else:
+                lower = score
+                pv = moves
+
+        # the pv of a fail low is just a bound, use the last fail high
+        if pv is None:
+            pv = moves
+        self._scores[depth] = score
+        return pv, score
+
+    def __str__(self):
+        return 'MTDf(%s)' % self._maxdepth
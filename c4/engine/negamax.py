@@ -2,21 +2,26 @@ import time
 from collections import defaultdict
 
 from c4.board import DRAW
-from c4.evaluate import INF
+from c4.evaluate import INF, IncrementalEvaluator
 from c4.engine.greedy import GreedyEngine
 
 
 class NegamaxEngine(GreedyEngine):
     FORMAT_STAT = (
         'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
-        'nps: {nps}, nodes: {nodes}, leaves: {leaves}, draws: {draws}, mates: {mates}'
+        'nps: {nps}, nodes: {nodes}, leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
         )
 
-    def __init__(self, maxdepth=4):
+    def __init__(self, maxdepth=4, tactics=True):
         super(NegamaxEngine, self).__init__()
         self._maxdepth = int(maxdepth)
+        self._tactics = bool(int(tactics))
+        self._evaluator = IncrementalEvaluator()
+        self.evaluate = self._evaluator.evaluate
 
     def choose(self, board):
+        self._evaluator.reset(board)
         self.initcnt()
         pv, score = self.search(board, self._maxdepth)
 
@@ -31,6 +36,9 @@ class NegamaxEngine(GreedyEngine):
         cnt['leaves'] = 0
         cnt['draws'] = 0
         cnt['mates'] = 0
+        cnt['wins'] = 0
+        cnt['forced'] = 0
+        cnt['pruned'] = 0
 
     def inc(self, cnt):
         self._counters[cnt] += 1
@@ -51,7 +59,47 @@ class NegamaxEngine(GreedyEngine):
         ctx['time'] = t
         
         print(self.FORMAT_STAT.format(**ctx))
-    
+
+    def makemove(self, board, m):
+        """Plays m on board in place, keeping the evaluation updated"""
+
+        self._evaluator.push(board, m)
+        board.push(m)
+
+    def unmakemove(self, board):
+        """Takes back the last move played with makemove"""
+
+        board.pop()
+        self._evaluator.pop()
+
+    def tactics(self, board, ply):
+        """Looks at the threats on board before searching it
+
+        Returns the moves to search and, when the threats alone decide the
+        node, its result (None otherwise): the side to move wins at once,
+        or loses because it can't stop two threats. Moves that let the
+        opponent win at once are dropped.
+
+        """
+        moves = board.moves()
+        if not self._tactics:
+            return moves, None
+
+        wins = board.winning_moves()
+        if wins:
+            self.inc('wins')
+            return wins, ([wins[0]], INF - ply - 1)
+
+        safe = board.nonlosing_moves()
+        self._counters['pruned'] += len(moves) - len(safe)
+        if not safe:
+            self.inc('wins')
+            return moves, ([moves[0]], -(INF - ply - 2))
+
+        if len(safe) == 1:
+            self.inc('forced')
+        return safe, None
+
     def search(self, board, depth, ply=1):
         self.inc('nodes')
 
@@ -62,10 +110,16 @@ class NegamaxEngine(GreedyEngine):
             self.inc('leaves')
             return [], self.evaluate(board)
 
+        moves, result = self.tactics(board, ply)
+        if result is not None:
+            return result
+
         bestmove = []
         bestscore = -INF
-        for m in board.moves():
-            nextmoves, score = self.search(board.move(m), depth-1, ply+1)
+        for m in moves:
+            self.makemove(board, m)
+            nextmoves, score = self.search(board, depth-1, ply+1)
+            self.unmakemove(board)
             score = -score
             if not bestmove or score >= bestscore:
                 bestscore = score
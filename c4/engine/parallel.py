@@ -0,0 +1,129 @@
+from c4.evaluate import INF
+from c4.engine.alphabeta import AlphaBetaEngine
+from c4.engine.pool import WorkerPoolEngineMixin
+from c4.engine.pvs import PVSEngine
+
+
+_engine = None
+
+
+def _init_worker(engine):
+    global _engine
+    _engine = engine
+
+
+def _search_child(board, depth, alpha, beta):
+    _engine.initcnt()
+    _engine._evaluator.reset(board)
+    pv, score = _engine.search(board, depth, 2, alpha, beta)
+    return pv, score, dict(_engine._counters)
+
+
+class RootSplitEngineMixin(WorkerPoolEngineMixin):
+    """Splits the root moves of a search between worker processes
+
+    The first root move is searched here to get a bound, then the other
+    moves are searched by a pool of workers with a zero window on that
+    bound. The moves that fail high are searched again with an open
+    window, in move order, so the result doesn't depend on the timing of
+    the workers. Counters include the nodes searched by the workers.
+
+    The workers are started by the first search and kept until close().
+
+    """
+    COUNTERS = ['nodes', 'leaves', 'draws', 'mates', 'betacuts',
+                'wins', 'forced', 'pruned']
+
+    def __init__(self, maxdepth=4, ordering='seq', workers=2, tactics=True):
+        super(RootSplitEngineMixin, self).__init__(maxdepth, ordering,
+                                                   tactics)
+        self._workers = int(workers)
+
+    def poolargs(self):
+        return self._workers, _init_worker, (self,)
+
+    def initcnt(self):
+        super(RootSplitEngineMixin, self).initcnt()
+        self._counters['workers'] = self._workers
+        self._counters['researches'] = 0
+
+    def addcnt(self, counters):
+        for name in self.COUNTERS:
+            self._counters[name] += counters[name]
+
+    def choose(self, board):
+        self.initcnt()
+        self.inc('nodes')
+        self._evaluator.reset(board)
+        self._moveorder.age()
+        board = board.copy()
+        depth = self._maxdepth
+
+        # the threats at the root are looked at as the serial search does
+        moves, result = self.tactics(board, 1)
+        if result is not None:
+            self.showstats(*result)
+            return result[0][0]
+
+        moves = list(self.moveorder(board, moves))
+        first = moves[0]
+        self.makemove(board, first)
+        nextmoves, score = self.search(board, depth-1, 2, -INF, INF)
+        self.unmakemove(board)
+        bestscore = -score
+        bestmove = [first] + nextmoves
+
+        bound = bestscore
+        children = [board.move(m) for m in moves[1:]]
+        results = []
+        if children:
+            pool = self.pool()
+            futures = [pool.submit(_search_child, child, depth-1,
+                                   -bound-1, -bound)
+                       for child in children]
+            results = [f.result() for f in futures]
+
+        for m, (_, score, counters) in zip(moves[1:], results):
+            self.addcnt(counters)
+            if -score <= bound:
+                continue
+
+            # fail high: the move is better than the first one but the
+            # score is just a lower bound, search it with the current window
+            self.inc('researches')
+            self.makemove(board, m)
+            nextmoves, score = self.search(board, depth-1, 2,
+                                           -INF, -bestscore)
+            self.unmakemove(board)
+            if -score > bestscore:
+                bestscore = -score
+                bestmove = [m] + nextmoves
+
+        self.showstats(bestmove, bestscore)
+        return bestmove[0]
+
+
+class ABParallelEngine(RootSplitEngineMixin, AlphaBetaEngine):
+    FORMAT_STAT = (
+        'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
+        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
+        'workers: {workers}, researches: {researches}, ' +
+        'leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
+        )
+
+    def __str__(self):
+        return 'ABParallel(%s, %s)' % (self._maxdepth, self._workers)
+
+
+class PVSParallelEngine(RootSplitEngineMixin, PVSEngine):
+    FORMAT_STAT = (
+        'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
+        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
+        'workers: {workers}, researches: {researches}, ' +
+        'leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
+        )
+
+    def __str__(self):
+        return 'PVSParallel(%s, %s)' % (self._maxdepth, self._workers)
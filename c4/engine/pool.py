@@ -0,0 +1,42 @@
+from concurrent.futures import ProcessPoolExecutor
+
+
+class WorkerPoolEngineMixin(object):
+    """Keeps a pool of worker processes for all the searches of an engine
+
+    The pool is started the first time it is needed and kept until close()
+    (or until the engine is collected). The engine supplies the number of
+    workers and their initializer with poolargs().
+
+    """
+    _pool = None
+
+    def __getstate__(self):
+        # the copies of the engine sent to the workers have no pool
+        state = self.__dict__.copy()
+        state.pop('_pool', None)
+        return state
+
+    def __del__(self):
+        self.close()
+
+    def poolargs(self):
+        """Returns the number of workers, their initializer and its
+        arguments"""
+
+        raise NotImplementedError()
+
+    def pool(self):
+        """Returns the pool of the workers, starting it if needed"""
+
+        if self._pool is None:
+            workers, initializer, initargs = self.poolargs()
+            self._pool = ProcessPoolExecutor(workers, initializer=initializer,
+                                             initargs=initargs)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        super(WorkerPoolEngineMixin, self).close()
@@ -15,22 +15,29 @@ class PVSEngine(AlphaBetaEngine):
             self.inc('leaves')
             return [], self.evaluate(board)
 
+        moves, result = self.tactics(board, ply)
+        if result is not None:
+            return result
+        if hint not in moves:
+            hint = None
+
+        # fail soft: the score can be outside of the window
         bestmove = []
-        bestscore = alpha
-        for i, m in enumerate(self.moveorder(board, board.moves(), hint)):
+        bestscore = -INF
+        for i, m in enumerate(self.moveorder(board, moves, hint, ply)):
+            floor = max(alpha, bestscore)
+            self.makemove(board, m)
             if i == 0 or depth == 1 or (beta-alpha) == 1:
-                nextmoves, score = self.search(board.move(m), depth-1, ply+1,
-                                               -beta, -bestscore)
+                nextmoves, score = self.search(board, depth-1, ply+1,
+                                               -beta, -floor)
             else:
                 # pvs uses a zero window for all the other searches
-                _, score = self.search(board.move(m), depth-1, ply+1,
-                                       -bestscore-1, -bestscore)
-                score = -score
-                if score > bestscore:
-                    nextmoves, score = self.search(board.move(m), depth-1, ply+1,
-                                                   -beta, -bestscore)
-                else:
-                    continue
+                nextmoves, score = self.search(board, depth-1, ply+1,
+                                               -floor-1, -floor)
+                if floor < -score < beta:
+                    nextmoves, score = self.search(board, depth-1, ply+1,
+                                                   -beta, -floor)
+            self.unmakemove(board)
 
             score = -score
             if score > bestscore:
@@ -41,6 +48,7 @@ class PVSEngine(AlphaBetaEngine):
 
             if bestscore >= beta:
                 self.inc('betacuts')
+                self._moveorder.cutoff(board, m, depth, ply)
                 break
 
         return bestmove, bestscore
@@ -53,7 +61,8 @@ class PVSCachedEngine(CachedEngineMixin, PVSEngine):
     FORMAT_STAT = (
         'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
         'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
-        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}'
+        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
         )
 
     def initcnt(self):
@@ -67,8 +76,10 @@ class PVSCachedEngine(CachedEngineMixin, PVSEngine):
 class PVSDeepEngine(CachedEngineMixin, IterativeDeepeningEngineMixin, PVSEngine):
     FORMAT_STAT = (
         '[depth: {depth}] score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
-        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
-        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}'
+        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}, ' +
+        'researches: {researches}\n' +
+        'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}\n' +
+        'wins: {wins}, forced: {forced}, pruned: {pruned}'
         )
 
     def initcnt(self):
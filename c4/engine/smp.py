@@ -0,0 +1,97 @@
+import multiprocessing
+
+from c4.engine.pvs import PVSDeepEngine
+from c4.engine.deepening import SearchAborted
+
+
+def _helper(engine, board, start, stop, results):
+    results.put(engine.deepen(board, start, stop) + (engine.allnodes,))
+
+
+class LazySMPEngine(PVSDeepEngine):
+    """PVS with Iterative Deepening running on several processes
+
+    Every process searches the same root and they only share the
+    transposition table, which lives in shared memory. Half of the helpers
+    start one depth ahead so that the processes don't search the same
+    nodes at the same time. The first process that completes maxdepth
+    stops the others and the deepest result is played.
+
+    """
+    def __init__(self, maxdepth=4, ordering='diff', threads=2, cachesize=64):
+        super(LazySMPEngine, self).__init__(maxdepth, ordering,
+                                            cache='shared',
+                                            cachesize=cachesize)
+        self._threads = int(threads)
+        self._stop = None
+        self.allnodes = 0
+
+    def aborted(self):
+        return (self._stop.is_set() or
+                super(LazySMPEngine, self).aborted())
+
+    def deepen(self, board, start, stop, verbose=False):
+        """Iterative deepening until maxdepth or until stop is set
+
+        Returns the depth, the pv and the score of the last completed
+        iteration.
+
+        """
+        self._stop = stop
+        self._evaluator.reset(board)
+        self._moveorder.age()
+        board = board.copy()
+        self.allnodes = 0
+
+        result = (0, [], None)
+        for depth in range(start, self._maxdepth + 1):
+            self.initcnt()
+            self._counters['depth'] = depth
+            try:
+                pv, score = self.search(board, depth)
+            except SearchAborted:
+                break
+            finally:
+                self.allnodes += self._counters['nodes']
+            result = (depth, pv, score)
+            if verbose:
+                self.showstats(pv, score)
+        else:
+            stop.set()
+
+        return result
+
+    def choose(self, board):
+        stop = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        helpers = []
+
+        for i in range(1, self._threads):
+            start = 1 + i % 2
+            p = multiprocessing.Process(target=_helper,
+                                        args=(self, board, start, stop,
+                                              results))
+            p.start()
+            helpers.append(p)
+
+        depth, pv, score = self.deepen(board, 1, stop, True)
+        totalnodes = self.allnodes
+        stop.set()
+
+        # main result first, so it wins the ties
+        best = (depth, pv, score)
+        for p in helpers:
+            hdepth, hpv, hscore, nodes = results.get()
+            totalnodes += nodes
+            if hdepth > best[0]:
+                best = (hdepth, hpv, hscore)
+        for p in helpers:
+            p.join()
+
+        depth, pv, score = best
+        print('threads: %d, depth: %d, score: %s, total nodes: %d' %
+              (self._threads, depth, score, totalnodes))
+        return pv[0]
+
+    def __str__(self):
+        return 'LazySMP(%s, %s)' % (self._maxdepth, self._threads)
@@ -0,0 +1,146 @@
+from c4.board import DRAW
+from c4.cache import Cache
+from c4.evaluate import INF
+from c4.engine.alphabeta import AlphaBetaEngine
+
+
+class SolverEngine(AlphaBetaEngine):
+    """Perfect play engine
+
+    Searches until the end of the game, so the score is the exact value of
+    the position: 0 for a draw, INF - n for a win of the side to move
+    where n is the number of pieces on the board at the end of the game
+    (-(INF - n) for a loss). The value is found with a sequence of null
+    window searches that bracket it.
+
+    """
+    FORMAT_STAT = (
+        'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
+        'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
+        'hits: {hits}, passes: {passes}, mates: {mates}'
+        )
+
+    # center columns first
+    ORDER = [3, 2, 4, 1, 5, 0, 6]
+
+    def __init__(self, maxitems=1000000):
+        super(SolverEngine, self).__init__(6 * 7)
+        self._cache = Cache(int(maxitems))
+
+    def initcnt(self):
+        super(SolverEngine, self).initcnt()
+        self._counters['hits'] = 0
+        self._counters['passes'] = 0
+
+    def choose(self, board):
+        pv, score = self.solve(board)
+        self.showstats(pv, score)
+        return pv[0]
+
+    def solve(self, board):
+        """Returns the principal variation and the exact score of board"""
+
+        self.initcnt()
+        board = board.copy()
+        n = board.ply
+        depth = 6 * 7 - n
+
+        # all the values the game can end with, sorted
+        values = sorted([-(INF - x) for x in range(n + 2, 6 * 7 + 1, 2)] +
+                        [0] +
+                        [INF - x for x in range(n + 1, 6 * 7 + 1, 2)])
+
+        # null window searches: test if the score is greater than a value
+        lo = 0
+        hi = len(values) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            self.inc('passes')
+            _, score = self.search(board, depth, 1, values[mid],
+                                   values[mid] + 1)
+            if score > values[mid]:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        score = values[lo]
+        self.inc('passes')
+        pv, _ = self.search(board, depth, 1, score - 1, score + 1)
+        return pv, score
+
+    def endscore(self, board, ply):
+        self.inc('leaves')
+        if board.end == DRAW:
+            self.inc('draws')
+            return [], 0
+        else:
+            self.inc('mates')
+            return [], -(INF - board.ply)
+
+    def order(self, board, moves, hint=None):
+        """Sort the moves by the number of threats they create"""
+
+        ordered = sorted(moves, key=lambda m: (m != hint,
+                                               -board.count_threats(m),
+                                               self.ORDER.index(m)))
+        return ordered
+
+    def search(self, board, depth, ply=1, alpha=-INF, beta=INF, hint=None):
+        self.inc('nodes')
+
+        if board.end is not None:
+            return self.endscore(board, ply)
+
+        n = board.ply
+        wins = board.winning_moves()
+        if wins:
+            self.inc('mates')
+            return wins[:1], INF - (n + 1)
+
+        moves = board.nonlosing_moves()
+        if not moves:
+            self.inc('mates')
+            return board.moves()[:1], -(INF - (n + 2))
+
+        # with two squares left nobody can win anymore
+        if n >= 6 * 7 - 2:
+            self.inc('draws')
+            return moves[:1], 0
+
+        # we can't win before our next move and the opponent can't win
+        # with the next one
+        alpha = max(alpha, -(INF - (n + 4)))
+        beta = min(beta, INF - (n + 3))
+        if alpha >= beta:
+            return [], alpha
+
+        hit, move, score = self._cache.lookup(board, depth, ply, alpha, beta)
+        if hit:
+            self.inc('hits')
+            if move is not None:
+                return [move], score
+            return [], score
+
+        bestmove = []
+        bestscore = alpha
+        for m in self.order(board, moves, move):
+            board.push(m)
+            nextmoves, score = self.search(board, depth-1, ply+1,
+                                           -beta, -bestscore)
+            board.pop()
+            score = -score
+            if score > bestscore:
+                bestscore = score
+                bestmove = [m] + nextmoves
+            elif not bestmove:
+                bestmove = [m] + nextmoves
+
+            if bestscore >= beta:
+                self.inc('betacuts')
+                break
+
+        self._cache.put(board, bestmove, depth, ply, bestscore, alpha, beta)
+        return bestmove, bestscore
+
+    def __str__(self):
+        return 'Solver'
@@ -3,7 +3,8 @@ import numpy as np
 from c4.board import Board
 from c4.evaluate import INF
 
-from c4.tables import evaldiff_lookup, evaldiff_threat_lookup
+from c4.tables import (evaldiff_lookup, evaldiff_threat_lookup,
+                       segment_weights, rev_segment_ids, rev_segment_mask)
 
 
 def evaldiff(board, m, weights=np.array([1, 3, 9, 27], dtype=int)):
@@ -20,3 +21,65 @@ def evaldiff(board, m, weights=np.array([1, 3, 9, 27], dtype=int)):
         return INF - 1
 
     return partial_scores.sum()
+
+
+def evaldiff_all(board):
+    """Computes evaldiff for all the legal moves at once
+
+    Returns the legal moves and an array with the evaldiff of each one.
+
+    """
+    moves = board.moves()
+    stm = board.stm
+    squares = [m * 6 + board.freerow(m) for m in moves]
+
+    codes = board.to_array().ravel().dot(segment_weights)
+    indices = codes[rev_segment_ids[squares]]
+    mask = rev_segment_mask[squares]
+    partial_scores = evaldiff_lookup[stm][indices] * mask
+
+    scores = partial_scores.sum(1)
+    scores[(evaldiff_threat_lookup[stm][indices] * mask).any(1)] = INF - 1
+    scores[(partial_scores == 4**2).any(1)] = INF
+
+    return moves, scores
+
+
+# lookup tables indexed by [stm, code], row 0 is unused. The code 3**4 is
+# a sentinel for the padding of rev_segment_ids, it scores 0. _flag_lookup
+# is 2 for a winning segment and 1 for a threat of the opponent.
+_lookup = np.zeros((3, 3**4 + 1), dtype=int)
+_flag_lookup = np.zeros((3, 3**4 + 1), dtype=int)
+for _stm in (1, 2):
+    _lookup[_stm, :3**4] = evaldiff_lookup[_stm]
+    _flag_lookup[_stm, :3**4] = evaldiff_threat_lookup[_stm]
+    _flag_lookup[_stm, :3**4][evaldiff_lookup[_stm] == 4**2] = 2
+# the codes are small integers, a float product is exact and uses BLAS
+_segment_weights = segment_weights.astype(float)
+_nsegments = segment_weights.shape[1]
+_segment_ids = np.where(rev_segment_mask, rev_segment_ids, _nsegments)
+
+
+def evaldiff_batch(batch):
+    """Computes evaldiff for every column of every board of a BoardBatch
+
+    Returns a (n, cols) array, the scores of the full columns are
+    meaningless: mask them with batch.legal().
+
+    """
+    n = len(batch)
+    codes = np.empty((n, _nsegments + 1), dtype=int)
+    codes[:, :-1] = batch.pos.reshape((n, -1)).dot(_segment_weights)
+    codes[:, -1] = 3**4
+
+    squares = np.arange(7) * 6 + np.minimum(batch.heights, 5)
+    indices = codes[np.arange(n)[:, np.newaxis, np.newaxis],
+                    _segment_ids[squares]]
+    stm = batch.stm.astype(int)[:, np.newaxis, np.newaxis]
+
+    scores = _lookup[stm, indices].sum(2)
+    flags = _flag_lookup[stm, indices].max(2)
+    scores[flags == 1] = INF - 1
+    scores[flags == 2] = INF
+
+    return scores
@@ -1,6 +1,7 @@
 import numpy as np
 
-from c4.board import Board, PLAYER1, PLAYER2, DRAW
+from c4.board import PLAYER1, PLAYER2, DRAW
+from c4.tables import segment_weights, segment_counts, rev_segment_weights
 
 INF = 1000
 
@@ -9,10 +10,14 @@ class Evaluator(object):
     def __init__(self, weights=[0, 0, 1, 4, 0]):
         self._weights = np.asarray(weights)
 
-    def evaluate(self, board):
-        scores = {PLAYER1: np.zeros(5, dtype=int),
-                  PLAYER2: np.zeros(5, dtype=int)}
+        # score of each segment code for PLAYER1: segments that contain
+        # pieces of a single player are worth the weight of their count
+        c1 = segment_counts[PLAYER1]
+        c2 = segment_counts[PLAYER2]
+        self._table = (np.where(c2 == 0, self._weights[c1], 0) -
+                       np.where(c1 == 0, self._weights[c2], 0))
 
+    def evaluate(self, board):
         if board.end is not None:
             if board.end == DRAW:
                 return 0
@@ -21,25 +26,90 @@ class Evaluator(object):
             else:
                 return -INF
 
-        segments = Board.segments(board)
-        filtered_segments = segments[segments.any(1)]
+        codes = board.to_array().ravel().dot(segment_weights)
+        score = int(self._table[codes].sum())
+        if board.stm == PLAYER1:
+            return score
+        else:
+            return -score
+
+    def evaluate_children(self, board):
+        """Evaluates all the children of board at once
+
+        Returns the legal moves and an array with the score of each child,
+        the same as evaluate(board.move(m)) for each move m.
+
+        """
+        moves = board.moves()
+        stm = board.stm
+        squares = [m * 6 + board.freerow(m) for m in moves]
 
-        for s in filtered_segments:
-            c = np.bincount(s, minlength=3)
+        codes = board.to_array().ravel().dot(segment_weights)
+        children = codes + stm * segment_weights[squares]
+        # the scores are from the point of view of the opponent
+        scores = self._table[children].sum(1)
+        if stm == PLAYER1:
+            scores = -scores
 
-            c1 = c[PLAYER1]
-            c2 = c[PLAYER2]
+        # a segment with 4 pieces of stm means that the child is a lost
+        # position for the player that moves next
+        wins = (children == stm * (1 + 3 + 9 + 27)).any(1)
+        if board.ply == 6 * 7 - 1:
+            scores[:] = 0
+        scores[wins] = -INF
 
-            if c2 == 0:
-                scores[PLAYER1][c1] += 1
-            elif c1 == 0:
-                scores[PLAYER2][c2] += 1
+        return moves, scores
 
-        s1 = (self._weights * scores[PLAYER1]).sum()
-        s2 = (self._weights * scores[PLAYER2]).sum()
 
-        score = s1 - s2
+class IncrementalEvaluator(Evaluator):
+    """Evaluator that keeps the score updated move by move
+
+    reset() loads the root board, then every Board.push() must be preceded
+    by push() and every Board.pop() followed by pop(). Only the segments
+    that pass by the square of the move are updated, so evaluate() is O(1).
+
+    """
+    def __init__(self, weights=[0, 0, 1, 4, 0]):
+        super(IncrementalEvaluator, self).__init__(weights)
+        self._scores = self._table.tolist()
+        self._codes = [0] * segment_weights.shape[1]
+        self._score = 0
+        self._history = []
+
+    def reset(self, board):
+        codes = board.to_array().ravel().dot(segment_weights)
+        self._codes = codes.tolist()
+        self._score = int(self._table[codes].sum())
+        self._history = []
+
+    def push(self, board, m):
+        scores = self._scores
+        codes = self._codes
+        stm = board.stm
+        updates = rev_segment_weights[m * 6 + board.freerow(m)]
+
+        delta = 0
+        for s, w in updates:
+            old = codes[s]
+            new = old + stm * w
+            codes[s] = new
+            delta += scores[new] - scores[old]
+
+        self._score += delta
+        self._history.append((updates, stm, delta))
+
+    def pop(self):
+        updates, stm, delta = self._history.pop()
+        codes = self._codes
+        for s, w in updates:
+            codes[s] -= stm * w
+        self._score -= delta
+
+    def evaluate(self, board):
+        if board.end is not None:
+            return super(IncrementalEvaluator, self).evaluate(board)
+
         if board.stm == PLAYER1:
-            return score
+            return self._score
         else:
-            return -score
+            return -self._score
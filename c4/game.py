@@ -15,13 +15,19 @@ class GameHandler(object):
             PLAYER2: self.engine2
             }
 
-        while b.end is None:
-            if self.verbose:
-                print(b)
-                print('Player %s is thinking...' % {PLAYER1: 'X', PLAYER2: 'O'}[b.stm])
-            player = players[b.stm]
-            move = player.choose(b)
-            b = b.move(move)
+        try:
+            while b.end is None:
+                if self.verbose:
+                    print(b)
+                    print('Player %s is thinking...' % {PLAYER1: 'X', PLAYER2: 'O'}[b.stm])
+                player = players[b.stm]
+                move = player.choose(b)
+                b = b.move(move)
+                # think on the opponent's time
+                player.ponder(b)
+        finally:
+            for player in players.values():
+                player.stop_pondering()
 
         if b.end == DRAW:
             winner = None
@@ -1,12 +1,18 @@
 import random
-from functools import partial
-
+from c4.board import PLAYER1, PLAYER2, columns
 from c4.evaluate import Evaluator
-from c4.evaldiff import evaldiff
+from c4.evaldiff import evaldiff_all
+
+
+# plies from the root, a search never goes deeper than the board is high
+MAXPLY = 6 * 7 + 2
+CENTER = [3, 2, 4, 1, 5, 0, 6]
 
 
 class MoveOrder(object):
     def __init__(self, name):
+        self.cutoff = self._cutoff_none
+        self._staged = False
         if name == 'seq':
             self._order = self._order_seq
         elif name == 'random':
@@ -15,39 +21,109 @@ class MoveOrder(object):
             self._order = self._order_eval
         elif name == 'diff':
             self._order = self._order_diff
+        elif name in ('history', 'staged'):
+            self._order = self._order_history
+            self.cutoff = self._cutoff_history
+            self._staged = name == 'staged'
+            self.reset()
         else:
             raise NotImplemented()
 
-    def _order_seq(self, board, moves):
+    def _order_seq(self, board, moves, ply):
         return moves
 
-    def _order_random(self, board, moves):
+    def _order_random(self, board, moves, ply):
         random.shuffle(moves)
         return moves
 
-    def _order_eval(self, board, moves):
-        if not hasattr(self, 'evaluate'):
-            self.evaluate = Evaluator().evaluate
+    def _order_eval(self, board, moves, ply):
+        if not hasattr(self, 'evaluator'):
+            self.evaluator = Evaluator()
 
         if len(moves) <= 1:
             return moves
 
-        return sorted(moves,
-                      key=lambda m: -self.evaluate(board.move(m)),
-                      reverse=True)
+        scores = dict(zip(*self.evaluator.evaluate_children(board)))
+        return sorted(moves, key=lambda m: -scores[m], reverse=True)
 
-    def _order_diff(self, board, moves):
+    def _order_diff(self, board, moves, ply):
         if len(moves) <= 1:
             return moves
 
-        return sorted(moves, key=partial(evaldiff, board),
-                      reverse=True)
+        scores = dict(zip(*evaldiff_all(board)))
+        return sorted(moves, key=scores.__getitem__, reverse=True)
+
+    def _order_history(self, board, moves, ply):
+        """Killer moves of this ply first, then by history score"""
+
+        if len(moves) <= 1:
+            return moves
+
+        history = self._history[board.stm]
+        killers = self._killers[ply]
+        rank = {m: (m in killers, history[m], -i)
+                for i, m in enumerate(CENTER)}
+        return sorted(moves, key=rank.__getitem__, reverse=True)
+
+    def _cutoff_none(self, board, m, depth, ply):
+        pass
+
+    def _cutoff_history(self, board, m, depth, ply):
+        self._history[board.stm][m] += depth * depth
+        killers = self._killers[ply]
+        if killers[0] != m:
+            killers[1] = killers[0]
+            killers[0] = m
+
+    def reset(self):
+        """Forgets killer moves and history scores"""
 
-    def order(self, board, moves, hint=None):
+        self._killers = [[None, None] for _ in range(MAXPLY)]
+        self._history = {PLAYER1: [0] * 7, PLAYER2: [0] * 7}
+
+    def age(self):
+        """Called before a new search: drops the killer moves (their plies
+        refer to the old root) and halves the history scores"""
+
+        if self.cutoff == self._cutoff_none:
+            return
+        history = self._history
+        self.reset()
+        for stm, scores in history.items():
+            self._history[stm] = [x >> 1 for x in scores]
+
+    def order(self, board, moves, hint=None, ply=1):
+        if self._staged:
+            return self._order_staged(board, moves, hint, ply)
+        return self._order_all(board, moves, hint, ply)
+
+    def _order_all(self, board, moves, hint, ply):
         if hint is not None:
             yield hint
 
-        for x in self._order(board, moves):
+        for x in self._order(board, moves, ply):
             if x == hint:
                 continue
             yield x
+
+    def _order_staged(self, board, moves, hint, ply):
+        """Yields the moves in stages, each computed only when needed
+        (usually a cut node stops after the first stage): the hint, the
+        winning moves, the blocks of the opponent's threats and then the
+        rest by killers and history"""
+
+        done = set()
+        if hint is not None:
+            done.add(hint)
+            yield hint
+
+        playable = board.playable()
+        for stage in (board.threats(), board.threats(board.other)):
+            for x in columns(playable & stage):
+                if x not in done:
+                    done.add(x)
+                    yield x
+
+        rest = [x for x in moves if x not in done]
+        for x in self._order(board, rest, ply):
+            yield x
@@ -1,5 +1,6 @@
 import numpy as np
 import itertools
+import random
 
 #
 # Segment tables
@@ -40,6 +41,41 @@ for idx in (_indices, _indices[:, ::-1]):
 all_segments = np.asarray(all_segments)
 rev_segments = np.asarray([np.asarray(x) for x in rev_segments])
 
+# segment_weights[square, segment] is 3**k when square is the k-th square of
+# segment, pos.flatten().dot(segment_weights) gives the base 3 code of every
+# segment using the same encoding of the evaldiff lookup tables
+segment_weights = np.zeros((7*6, len(all_segments)), dtype=int)
+for _s, _seg in enumerate(all_segments):
+    segment_weights[_seg, _s] = 3 ** np.arange(4)
+
+# rev_segment_weights[square] lists the (segment, 3**k) pairs of the segments
+# that pass by square, k being the position of square in the segment
+rev_segment_weights = [[] for x in range(7*6)]
+for _s, _seg in enumerate(all_segments):
+    for _k, _n in enumerate(_seg):
+        rev_segment_weights[_n].append((_s, 3**_k))
+
+# rev_segment_ids[square] are the indices in all_segments of the segments that
+# pass by square, padded to the same length, rev_segment_mask marks the
+# indices that are not padding
+_maxrev = max(len(x) for x in rev_segment_weights)
+rev_segment_ids = np.zeros((7*6, _maxrev), dtype=int)
+rev_segment_mask = np.zeros((7*6, _maxrev), dtype=bool)
+for _n, _pairs in enumerate(rev_segment_weights):
+    rev_segment_ids[_n, :len(_pairs)] = [_s for _s, _w in _pairs]
+    rev_segment_mask[_n, :len(_pairs)] = True
+
+# number of pieces of each player for every segment code
+segment_counts = {
+    1: np.zeros(3**4, dtype=int),
+    2: np.zeros(3**4, dtype=int),
+}
+for _code in range(3**4):
+    for _k in range(4):
+        _x = _code // 3**_k % 3
+        if _x:
+            segment_counts[_x][_code] += 1
+
 
 #
 # evaldiff lookup tables
@@ -82,3 +118,17 @@ for comb in itertools.product(range(3), range(3), range(3), range(3)):
         evaldiff_threat_lookup[1][key] = 1
     elif score1 == 4 ** 2:
         evaldiff_threat_lookup[2][key] = 1
+
+
+#
+# Zobrist keys
+#
+# zobrist[player][col][row] is a random 64 bit key for a piece of player in
+# the square (col, row). The generator is seeded so that the keys are the
+# same in every process and can be stored on disk.
+#
+
+_zobrist_rng = random.Random(0x0c4)
+zobrist = [[[_zobrist_rng.getrandbits(64) for row in range(6)]
+            for col in range(7)]
+           for player in range(3)]
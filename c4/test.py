@@ -1,8 +1,27 @@
+import io
+import os
+import pickle
+import re
+import tempfile
+import time
 import unittest
+from contextlib import redirect_stdout
 
 import numpy as np
 
-from c4.board import Board, PLAYER1
+from c4.evaluate import Evaluator, IncrementalEvaluator, INF
+from c4.evaldiff import evaldiff, evaldiff_all, evaldiff_batch
+from c4.engine import (GreedyEngine, SolverEngine, LazySMPEngine,
+                       AlphaBetaEngine, ABParallelEngine, ABDeepEngine,
+                       PVSEngine, PVSParallelEngine, PVSDeepEngine,
+                       MTDfEngine, MonteCarloTreeSearch)
+from c4.book import OpeningBook, generate_book
+from c4.moveorder import MoveOrder
+from c4.game import GameHandler
+from c4.engine.deepening import SearchAborted
+from c4.cache import Cache, ArrayCache, SharedArrayCache, Entry
+from c4.board import (Board, BoardBatch, WrongMoveError,
+                      PLAYER1, PLAYER2, DRAW)
 
 
 class TestBoard(unittest.TestCase):
@@ -87,3 +106,792 @@ class TestBoard(unittest.TestCase):
                             [1, 2, 1, 2, 2, 1, 0],
                             [1, 2, 1, 1, 1, 2, 1]])[::-1])
         self.assertTrue(b.end == PLAYER1)
+
+
+def random_game(seed, maxmoves=42):
+    rng = np.random.RandomState(seed)
+    b = Board()
+    boards = [b]
+    while b.end is None and len(boards) <= maxmoves:
+        b = b.move(rng.choice(b.moves()))
+        boards.append(b)
+    return boards
+
+
+class TestBitboard(unittest.TestCase):
+    def test_array_roundtrip(self):
+        for seed in range(20):
+            for b in random_game(seed):
+                pos = b.to_array()
+                self.assertEqual(pos.shape, (7, 6))
+                c = Board(pos, b.stm)
+                self.assertTrue((c.to_array() == pos).all())
+                self.assertEqual(c.end, b.end)
+                self.assertEqual(c.hashkey(), b.hashkey())
+
+    def test_end_matches_segments(self):
+        for seed in range(20):
+            for b in random_game(seed):
+                segments = Board.segments(b)
+                if (segments == PLAYER1).all(1).any():
+                    self.assertEqual(b.end, PLAYER1)
+                elif (segments == PLAYER2).all(1).any():
+                    self.assertEqual(b.end, PLAYER2)
+                elif b.to_array().all():
+                    self.assertEqual(b.end, DRAW)
+                else:
+                    self.assertIsNone(b.end)
+
+    def test_moves_freerow(self):
+        for b in random_game(0):
+            pos = b.to_array()
+            self.assertEqual(list(b.moves()),
+                             list(np.flatnonzero(pos[:, -1] == 0)))
+            for m in b.moves():
+                self.assertEqual(b.freerow(m), pos[m].argmin())
+
+    def test_hashkey_mirror(self):
+        for b in random_game(1):
+            mirrored = Board(b.to_array()[::-1], b.stm)
+            self.assertEqual(b.hashkey()[0], mirrored.hashkey()[0])
+
+    def test_hashkey_incremental(self):
+        for seed in range(10):
+            for b in random_game(seed):
+                self.assertEqual(Board(b.to_array(), b.stm).hashkey(),
+                                 b.hashkey())
+                if b.end is None:
+                    for m in b.moves():
+                        self.assertEqual(b.hashkey(m), b.move(m).hashkey())
+
+        b1 = Board().move(0).move(1).move(2)
+        b2 = Board().move(2).move(1).move(0)
+        self.assertEqual(b1.hashkey(), b2.hashkey())
+        self.assertNotEqual(b1.hashkey(), b1.move(3).hashkey())
+
+    def test_push_pop(self):
+        for seed in range(10):
+            boards = random_game(seed)
+            moves = [int(np.flatnonzero(a.to_array() != b.to_array())[0] // 6)
+                     for a, b in zip(boards, boards[1:])]
+            b = Board()
+            for m, expected in zip(moves, boards[1:]):
+                b.push(m)
+                self.assertTrue((b.to_array() == expected.to_array()).all())
+                self.assertEqual(b.hashkey(), expected.hashkey())
+                self.assertEqual((b.stm, b.end), (expected.stm, expected.end))
+
+            for m, expected in zip(reversed(moves), reversed(boards[:-1])):
+                self.assertEqual(b.pop(), m)
+                self.assertTrue((b.to_array() == expected.to_array()).all())
+                self.assertEqual(b.hashkey(), expected.hashkey())
+                self.assertEqual((b.stm, b.end), (expected.stm, expected.end))
+
+    def test_threats(self):
+        for seed in range(20):
+            for b in random_game(seed):
+                if b.end is not None:
+                    continue
+                wins = [m for m in b.moves() if b.move(m).end == b.stm]
+                self.assertEqual(b.winning_moves(), wins)
+
+                nonlosing = [m for m in b.moves()
+                             if not b.move(m).winning_moves()]
+                self.assertEqual(b.nonlosing_moves(), nonlosing)
+
+    def test_full_column(self):
+        b = Board()
+        for i in range(6):
+            b = b.move(0)
+        self.assertIsNone(b.freerow(0))
+        self.assertNotIn(0, b.moves())
+        self.assertRaises(WrongMoveError, b.move, 0)
+
+
+class TestBoardBatch(unittest.TestCase):
+    def test_against_board(self):
+        rng = np.random.RandomState(0)
+        n = 30
+        batch = BoardBatch(n)
+        boards = [Board() for i in range(n)]
+
+        while (batch.end == BoardBatch.PLAYING).any():
+            legal = batch.legal()
+            moves = np.full(n, -1)
+            for i, b in enumerate(boards):
+                self.assertEqual(list(np.flatnonzero(legal[i])),
+                                 list(b.moves()) if b.end is None else [])
+                if b.end is None:
+                    moves[i] = rng.choice(b.moves())
+                    boards[i] = b.move(moves[i])
+            batch.push(moves)
+
+            for i, b in enumerate(boards):
+                self.assertTrue((batch.pos[i] == b.to_array()).all())
+                self.assertEqual(batch.stm[i], b.stm)
+                expected = BoardBatch.PLAYING if b.end is None else b.end
+                self.assertEqual(batch.end[i], expected)
+                self.assertEqual(batch[i].hashkey(), b.hashkey())
+
+    def test_from_boards(self):
+        boards = [b for b in random_game(2)]
+        batch = BoardBatch.from_boards(boards)
+        self.assertEqual(len(batch), len(boards))
+        for i, b in enumerate(boards):
+            self.assertEqual(batch[i].end, b.end)
+            self.assertEqual(batch[i].stm, b.stm)
+
+
+class TestEvaluator(unittest.TestCase):
+    def reference(self, board, weights):
+        scores = {PLAYER1: np.zeros(5, dtype=int),
+                  PLAYER2: np.zeros(5, dtype=int)}
+        for s in Board.segments(board):
+            c = np.bincount(s, minlength=3)
+            if c[PLAYER2] == 0 and c[PLAYER1]:
+                scores[PLAYER1][c[PLAYER1]] += 1
+            elif c[PLAYER1] == 0 and c[PLAYER2]:
+                scores[PLAYER2][c[PLAYER2]] += 1
+        score = ((weights * scores[PLAYER1]).sum() -
+                 (weights * scores[PLAYER2]).sum())
+        return score if board.stm == PLAYER1 else -score
+
+    def test_evaluate(self):
+        for weights in ([0, 0, 1, 4, 0], [0, 1, 2, 3, 5]):
+            evaluator = Evaluator(weights)
+            for seed in range(10):
+                for b in random_game(seed):
+                    if b.end is None:
+                        self.assertEqual(evaluator.evaluate(b),
+                                         self.reference(b, np.array(weights)))
+                    elif b.end == DRAW:
+                        self.assertEqual(evaluator.evaluate(b), 0)
+                    else:
+                        self.assertEqual(evaluator.evaluate(b), -INF)
+
+    def test_incremental(self):
+        evaluator = Evaluator()
+        incremental = IncrementalEvaluator()
+        rng = np.random.RandomState(0)
+        for seed in range(10):
+            b = random_game(seed, 10)[-1].copy()
+            incremental.reset(b)
+            moves = []
+            for i in range(200):
+                if b.end is None and (not moves or rng.rand() < 0.6):
+                    m = rng.choice(b.moves())
+                    incremental.push(b, m)
+                    b.push(m)
+                    moves.append(m)
+                elif moves:
+                    b.pop()
+                    incremental.pop()
+                    moves.pop()
+                self.assertEqual(incremental.evaluate(b), evaluator.evaluate(b))
+
+    def test_children(self):
+        evaluator = Evaluator()
+        for seed in range(20):
+            for b in random_game(seed):
+                if b.end is not None:
+                    continue
+                moves, scores = evaluator.evaluate_children(b)
+                self.assertEqual(list(moves), list(b.moves()))
+                self.assertEqual(list(scores),
+                                 [evaluator.evaluate(b.move(m)) for m in moves])
+
+                moves, scores = evaldiff_all(b)
+                self.assertEqual(list(moves), list(b.moves()))
+                self.assertEqual(list(scores), [evaldiff(b, m) for m in moves])
+
+    def test_evaldiff_batch(self):
+        boards = [b for seed in range(20) for b in random_game(seed)
+                  if b.end is None]
+        batch = BoardBatch.from_boards(boards)
+        scores = evaldiff_batch(batch)
+        legal = batch.legal()
+        for b, row, mask in zip(boards, scores, legal):
+            moves, expected = evaldiff_all(b)
+            self.assertEqual(list(np.flatnonzero(mask)), list(moves))
+            self.assertEqual(list(row[moves]), list(expected))
+
+
+class TestMoveOrder(unittest.TestCase):
+    def test_history(self):
+        order = MoveOrder('history')
+        board = Board()
+        self.assertEqual(list(order.order(board, board.moves())),
+                         [3, 2, 4, 1, 5, 0, 6])
+
+        order.cutoff(board, 5, 2, 1)
+        order.cutoff(board, 6, 3, 1)
+        self.assertEqual(list(order.order(board, board.moves(), 0))[:3],
+                         [0, 6, 5])
+        self.assertEqual(list(order.order(board, board.moves(), None, 2)),
+                         [6, 5, 3, 2, 4, 1, 0])
+
+        order.age()
+        self.assertEqual(order._killers[1], [None, None])
+        self.assertEqual(order._history[PLAYER1][6], 4)
+
+    def test_staged(self):
+        order = MoveOrder('staged')
+        # X wins in column 0, O threatens column 6
+        board = Board()
+        for m in [0, 6, 0, 6, 0, 6]:
+            board = board.move(m)
+        moves = order.order(board, board.moves(), 2)
+        self.assertEqual(next(moves), 2)
+        self.assertEqual(next(moves), 0)
+        self.assertEqual(next(moves), 6)
+        self.assertEqual(sorted(moves), [1, 3, 4, 5])
+
+        # O wins in column 6 before blocking column 0
+        board = board.move(1)
+        self.assertEqual(list(order.order(board, board.moves()))[:2], [6, 0])
+
+    def test_same_score(self):
+        for seed in range(4):
+            board = random_game(seed, 10)[-1]
+            if board.end is not None:
+                continue
+            scores = []
+            for ordering in ('seq', 'history', 'staged'):
+                engine = AlphaBetaEngine(5, ordering)
+                with redirect_stdout(io.StringIO()):
+                    engine.choose(board)
+                    scores.append(engine.search(board, 5)[1])
+            self.assertEqual(scores[0], scores[1])
+            self.assertEqual(scores[0], scores[2])
+
+
+class TestTactics(unittest.TestCase):
+    def test_tactics(self):
+        engine = AlphaBetaEngine(4)
+        engine.initcnt()
+        board = Board()
+        for m in [0, 6, 0, 6, 0]:
+            board = board.move(m)
+        # O has to block, otherwise X wins at once
+        self.assertEqual(engine.tactics(board, 1), ([0], None))
+        self.assertEqual(engine.tactics(board.move(6), 2),
+                         ([0], ([0], INF - 3)))
+
+        # O can't block both sides
+        board = Board()
+        for m in [2, 2, 3, 3, 4]:
+            board = board.move(m)
+        moves, result = engine.tactics(board, 1)
+        self.assertEqual(result[1], -(INF - 3))
+
+        engine = AlphaBetaEngine(4, tactics=False)
+        self.assertEqual(engine.tactics(board, 1), (board.moves(), None))
+
+    def test_prune(self):
+        for seed in range(4):
+            board = random_game(seed, 16)[-1]
+            if board.end is not None:
+                continue
+            nodes = []
+            for tactics in (False, True):
+                engine = PVSEngine(4, 'seq', tactics=tactics)
+                with redirect_stdout(io.StringIO()):
+                    engine.choose(board)
+                nodes.append(engine._counters['nodes'])
+            self.assertLessEqual(nodes[1], nodes[0])
+
+
+class TestSolver(unittest.TestCase):
+    def exact(self, board, memo):
+        if board.end is not None:
+            return 0 if board.end == DRAW else -(INF - board.ply)
+        key = board.hashkey()[0]
+        if key not in memo:
+            memo[key] = max(-self.exact(board.move(m), memo)
+                            for m in board.moves())
+        return memo[key]
+
+    def test_solve(self):
+        memo = {}
+        for seed in range(5):
+            board = random_game(seed, 28)[-1]
+            if board.end is not None:
+                continue
+            pv, score = SolverEngine().solve(board)
+            self.assertEqual(score, self.exact(board, memo))
+            self.assertEqual(-self.exact(board.move(pv[0]), memo), score)
+
+
+class TestOpeningBook(unittest.TestCase):
+    def test_book(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            engine = GreedyEngine()
+            n = generate_book(engine, 2, path)
+            book = OpeningBook(path)
+            self.assertEqual(len(book), n)
+
+            boards = [Board()]
+            boards += [b.move(m) for b in boards for m in b.moves()]
+            boards += [b.move(m) for b in boards[1:] for m in b.moves()]
+            for b in boards:
+                move = book.lookup(b)
+                mirrored = Board(b.to_array()[::-1], b.stm)
+                if (mirrored.to_array() == b.to_array()).all():
+                    self.assertEqual(book.lookup(mirrored), move)
+                else:
+                    self.assertEqual(book.lookup(mirrored), 6 - move)
+                # the engine searched one of the two orientations
+                self.assertTrue(move == engine.choose(b) or
+                                6 - move == engine.choose(mirrored))
+
+            b = boards[-1].move(0)
+            self.assertIsNone(book.lookup(b))
+        finally:
+            os.remove(path)
+
+
+class TestCache(unittest.TestCase):
+    def test_array_cache(self):
+        cache = Cache()
+        array_cache = ArrayCache(1)
+        rng = np.random.RandomState(0)
+        boards = [b for seed in range(5) for b in random_game(seed)
+                  if b.end is None]
+        for b in boards:
+            depth = rng.randint(-1, 10)
+            score = rng.randint(-INF, INF)
+            alpha = rng.randint(-INF, INF)
+            beta = alpha + rng.randint(1, 100)
+            moves = [rng.choice(b.moves())] if rng.rand() < 0.8 else []
+            for c in (cache, array_cache):
+                c.put(b, moves, depth, 1, score, alpha, beta)
+
+        for b in boards:
+            for depth in range(-1, 10):
+                alpha = rng.randint(-INF, INF)
+                beta = alpha + rng.randint(1, 100)
+                self.assertEqual(array_cache.lookup(b, depth, 1, alpha, beta),
+                                 cache.lookup(b, depth, 1, alpha, beta))
+
+    def test_empty_board(self):
+        # the key of the empty board is 0, as the empty slots
+        cache = ArrayCache(1)
+        self.assertEqual(Board().hashkey()[0], 0)
+        self.assertEqual(cache.lookup(Board(), 5, 1), (False, None, None))
+        self.assertEqual(len(cache), 0)
+        cache.put(Board(), [3], 5, 1, 0)
+        self.assertEqual(cache.lookup(Board(), 5, 1), (True, 3, 0))
+        self.assertEqual(len(cache), 1)
+
+        move = ABDeepEngine(4, 'diff', cache='array').choose(Board())
+        self.assertEqual(move,
+                         ABDeepEngine(4, 'diff', cache='lru').choose(Board()))
+
+    def test_pack(self):
+        for entry in (Entry(None, -1, -INF, Cache.EXACT),
+                      Entry(6, 42, INF, Cache.LOWERBOUND),
+                      Entry(0, 0, -3, Cache.UPPERBOUND)):
+            self.assertEqual(ArrayCache.unpack(ArrayCache.pack(entry)), entry)
+
+    def test_replacement(self):
+        cache = ArrayCache(0)
+        boards = random_game(0)[1:4]
+        cache.put(boards[0], [], 8, 1, 0)
+        cache.put(boards[1], [], 2, 1, 0)
+        cache.put(boards[2], [], 3, 1, 0)
+        # the deep entry is kept, the last one replaces the always slot
+        self.assertTrue(cache.lookup(boards[0], 8, 1)[0])
+        self.assertFalse(cache.lookup(boards[1], 2, 1)[0])
+        self.assertTrue(cache.lookup(boards[2], 3, 1)[0])
+
+    def test_shared_cache(self):
+        cache = SharedArrayCache(1)
+        copy = pickle.loads(pickle.dumps(cache))
+        boards = random_game(0)
+        for depth, b in enumerate(boards):
+            cache.put(b, b.moves()[:1], depth, 1, depth)
+        for depth, b in enumerate(boards):
+            self.assertEqual(copy.lookup(b, depth, 1),
+                             (True, b.moves()[:1][0] if b.moves() else None,
+                              depth))
+
+
+class TestLazySMP(unittest.TestCase):
+    def test_choose(self):
+        for seed in range(3):
+            board = random_game(seed, 8)[-1]
+            if board.end is not None:
+                continue
+            engine = LazySMPEngine(5, 'diff', 3, 1)
+            out = io.StringIO()
+            with redirect_stdout(out):
+                move = engine.choose(board)
+            self.assertIn(move, board.moves())
+            result = out.getvalue().splitlines()[-1]
+            self.assertIn('depth: 5,', result)
+
+            # the shared table doesn't change the score of the search
+            serial = io.StringIO()
+            with redirect_stdout(serial):
+                PVSDeepEngine(5, 'diff').choose(board)
+            score = re.findall(r'score: (-?\d+)', serial.getvalue())[-1]
+            self.assertIn('score: %s,' % score, result)
+
+
+class TestRootSplit(unittest.TestCase):
+    def choose(self, engine, board):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            move = engine.choose(board)
+        score = int(out.getvalue().split()[1])
+        return move, score
+
+    def test_same_as_serial(self):
+        for seed in range(3):
+            board = random_game(seed, 8)[-1]
+            if board.end is not None:
+                continue
+            self.assertEqual(self.choose(ABParallelEngine(4, 'diff', 2), board),
+                             self.choose(AlphaBetaEngine(4, 'diff'), board))
+            self.assertEqual(self.choose(PVSParallelEngine(4, 'diff', 2), board),
+                             self.choose(PVSEngine(4, 'diff'), board))
+
+    def test_tactics(self):
+        # X wins in column 1 or 7, then X loses whatever it plays
+        won = Board()
+        for m in [0, 1, 0, 1, 0, 2, 6, 5, 6, 5, 6, 2]:
+            won = won.move(m)
+        lost = Board()
+        for m in [2, 3, 2, 4, 5, 1, 4, 3, 3, 6, 4, 2, 0, 6, 4]:
+            lost = lost.move(m)
+
+        for board in (won, lost):
+            for parallel, serial in ((ABParallelEngine, AlphaBetaEngine),
+                                     (PVSParallelEngine, PVSEngine)):
+                engine = parallel(4, 'diff', 2)
+                self.assertEqual(self.choose(engine, board),
+                                 self.choose(serial(4, 'diff'), board))
+                self.assertEqual(engine._counters['nodes'], 1)
+                # the workers aren't needed
+                self.assertIsNone(engine._pool)
+
+    def test_pool(self):
+        engine = ABParallelEngine(3, 'diff', 2)
+        board = Board()
+        self.choose(engine, board)
+        pool = engine._pool
+        self.assertIsNotNone(pool)
+        # the workers are reused by the next search
+        self.choose(engine, board.move(3))
+        self.assertIs(engine._pool, pool)
+        engine.close()
+        self.assertIsNone(engine._pool)
+        self.assertEqual(self.choose(engine, board),
+                         self.choose(AlphaBetaEngine(3, 'diff'), board))
+        engine.close()
+
+
+class TestDeepening(unittest.TestCase):
+    def test_movetime(self):
+        board = Board()
+        engine = PVSDeepEngine(42, 'seq', movetime=0.3)
+        start = time.time()
+        with redirect_stdout(io.StringIO()):
+            move = engine.choose(board)
+        self.assertIn(move, board.moves())
+        self.assertLess(time.time() - start, 1)
+        self.assertIsNone(engine._deadline)
+
+    def test_clock(self):
+        engine = PVSDeepEngine(42, 'diff', clock=2, increment=0.1)
+        board = Board()
+        self.assertAlmostEqual(engine.budget(board), 2 / 21 + 0.1)
+        with redirect_stdout(io.StringIO()):
+            engine.choose(board)
+        self.assertLess(engine._clock, 2.1)
+        self.assertGreater(engine._clock, 1.5)
+
+    def test_abort(self):
+        engine = PVSDeepEngine(42, 'seq')
+        engine.initcnt()
+        engine._evaluator.reset(Board())
+        engine._deadline = time.time() - 1
+        self.assertRaises(SearchAborted, engine.search, Board(), 12)
+
+    def test_aspiration(self):
+        narrow = 0
+        for seed in range(4):
+            board = random_game(seed, 10)[-1]
+            if board.end is not None:
+                continue
+            results = []
+            for aspiration in (0, 1, 50):
+                engine = PVSDeepEngine(6, 'diff', aspiration=aspiration)
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    move = engine.choose(board)
+                out = out.getvalue()
+                score = int(re.findall(r'score: (-?\d+)', out)[-1])
+                researches = sum(map(int, re.findall(r'researches: (\d+)',
+                                                     out)))
+                results.append((move, score, researches))
+
+            # the window changes the work, not the result
+            for move, score, researches in results[1:]:
+                self.assertEqual((move, score), results[0][:2])
+            self.assertEqual(results[0][2], 0)
+            narrow += results[1][2]
+
+        # a window of 1 misses the score of almost every depth (mate scores
+        # are searched with the full window)
+        self.assertGreater(narrow, 0)
+
+
+class TestMTDf(unittest.TestCase):
+    def test_same_score(self):
+        for seed in range(4):
+            board = random_game(seed, 10)[-1]
+            if board.end is not None:
+                continue
+            scores = []
+            for cls in (PVSDeepEngine, MTDfEngine):
+                engine = cls(6, 'diff')
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    engine.choose(board)
+                scores.append(engine._scores[6] if cls is MTDfEngine else
+                              engine.search(board, 6)[1])
+                self.assertIn('total nodes:', out.getvalue())
+            self.assertEqual(scores[0], scores[1])
+            self.assertGreater(engine._counters['passes'], 1)
+
+    def test_fail_soft(self):
+        # both families return bounds outside of the window, for MTD(f)
+        soft = {AlphaBetaEngine: 0, PVSEngine: 0}
+        for seed in range(4):
+            board = random_game(seed, 10)[-1]
+            # an immediate win is never searched
+            if board.end is not None or board.winning_moves():
+                continue
+            for cls in soft:
+                engine = cls(5, 'diff')
+                engine.initcnt()
+                engine._evaluator.reset(board)
+                score = engine.search(board.copy(), 5)[1]
+                for alpha, beta in ((score - 1, score), (score, score + 1)):
+                    bound = engine.search(board.copy(), 5, 1, alpha, beta)[1]
+                    self.assertEqual(bound, score)
+                alpha, beta = score - 20, score - 10
+                bound = engine.search(board.copy(), 5, 1, alpha, beta)[1]
+                self.assertTrue(beta <= bound <= score)
+                alpha, beta = score + 10, score + 20
+                bound = engine.search(board.copy(), 5, 1, alpha, beta)[1]
+                self.assertTrue(score <= bound <= alpha)
+                soft[cls] += bound < alpha
+        self.assertTrue(all(soft.values()))
+
+
+class TestMCTS(unittest.TestCase):
+    def test_tree(self):
+        engine = MonteCarloTreeSearch(50)
+        board = Board()
+        engine.reroot(board)
+        engine.search(board, 50, engine.C)
+        root = engine._root
+        self.assertEqual(engine._visits[root], 50)
+        self.assertEqual(engine._size, 51)
+
+        children = engine._children[root]
+        self.assertTrue((children != -1).all())
+        self.assertEqual(engine._visits[children].sum(), 50)
+        self.assertTrue((engine._parent[children] == root).all())
+
+    def test_reuse(self):
+        engine = MonteCarloTreeSearch(50)
+        board = Board()
+        with redirect_stdout(io.StringIO()):
+            move = engine.choose(board)
+        board = board.move(move)
+        reply = int(np.flatnonzero(engine._children[engine._root] != -1)[0])
+        child = engine._children[engine._root, reply]
+        visits = engine._visits[child]
+
+        board = board.move(reply)
+        engine.reroot(board)
+        self.assertEqual(engine._root, 0)
+        self.assertEqual(engine._visits[0], visits)
+        self.assertEqual(engine._parent[0], -1)
+        # only the subtree of the new root is kept
+        self.assertLessEqual(engine._size, visits)
+
+        engine.reroot(Board().move(0).move(0).move(0))
+        self.assertEqual(engine._size, 1)
+
+    def test_budget(self):
+        engine = MonteCarloTreeSearch(100, maxnodes=40)
+        board = Board()
+        engine.reroot(board)
+        engine.search(board, 100, engine.C)
+        self.assertLessEqual(engine._size, 40)
+        self.assertGreater(engine._evicted, 0)
+        self.assertEqual(engine._visits[engine._root], 100)
+
+        # the tree is still consistent after the evictions
+        size = engine._size
+        children = engine._children[:size]
+        expanded = children[children != -1]
+        self.assertEqual(sorted(expanded), list(range(1, size)))
+        for node in range(1, size):
+            self.assertIn(node, children[engine._parent[node]])
+
+    def test_parallel(self):
+        board = Board().move(3)
+        engine = MonteCarloTreeSearch(40, workers=2, parallel='root')
+        engine.reroot(board)
+        visits, wins, depth = engine.search_root(board, 40, engine.C)
+        self.assertEqual(visits.sum(), 40)
+        self.assertEqual(engine._visits[engine._root], 20)
+        engine.close()
+
+        engine = MonteCarloTreeSearch(40, workers=2, parallel='tree')
+        engine.reroot(board)
+        engine.search_tree(board, 40, engine.C)
+        visits, wins = engine.rootstats()
+        self.assertEqual(engine._visits[engine._root], 40)
+        self.assertEqual(visits.sum(), 40)
+        self.assertTrue((wins <= visits).all())
+
+        # the workers are kept for the next search
+        pool = engine._pool
+        engine.search_tree(board, 40, engine.C)
+        self.assertIs(engine._pool, pool)
+        self.assertEqual(engine._visits[engine._root], 80)
+        engine.close()
+        self.assertIsNone(engine._pool)
+
+        self.assertRaises(ValueError, MonteCarloTreeSearch, parallel='leaf')
+
+    def test_batch(self):
+        engine = MonteCarloTreeSearch(100, batch=16)
+        # X wins at once, every simulation finds the win
+        board = Board()
+        for m in [0, 6, 0, 6, 0, 6]:
+            board = board.move(m)
+        results = engine.simulate_batch([board] * 50)
+        self.assertTrue((results == 1).all())
+
+        results = engine.simulate_batch([random_game(seed, 8)[-1]
+                                         for seed in range(50)])
+        self.assertTrue(np.isin(results, [0, 0.5, 1]).all())
+
+        board = Board()
+        engine.reroot(board)
+        engine.search(board, 100, engine.C)
+        self.assertEqual(engine._visits[engine._root], 100)
+        self.assertEqual(engine.rootstats()[0].sum(), 100)
+
+    def test_solver(self):
+        # X wins in column 0
+        board = Board()
+        for m in [0, 6, 0, 6, 0, 5]:
+            board = board.move(m)
+        engine = MonteCarloTreeSearch(100)
+        engine.reroot(board)
+        engine.search(board, 100, engine.C)
+        self.assertLess(engine._visits[engine._root], 100)
+        self.assertEqual(engine._proven[engine._root], 2)
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(engine.choose(board), 0)
+
+        # O has to block, all the other moves are proven losses
+        board = Board()
+        for m in [0, 6, 0, 6, 0]:
+            board = board.move(m)
+        engine = MonteCarloTreeSearch(100)
+        engine.reroot(board)
+        engine.search(board, 100, engine.C)
+        children = engine._children[engine._root]
+        self.assertEqual(list(engine._proven[children]), [0] + [2] * 6)
+        self.assertEqual(list(engine._visits[children[1:]]), [1] * 6)
+
+    def test_rave(self):
+        engine = MonteCarloTreeSearch(100, rave=300)
+        board = Board()
+        engine.reroot(board)
+        child = engine.newnode(0, board.move(3))
+        engine._children[0, 3] = child
+
+        # X played on d1 and c1, O on d2 and won
+        final = np.zeros((7, 6), dtype=int)
+        final[3, 0] = final[2, 0] = 1
+        final[3, 1] = 2
+        engine.backup([0, child], 1, final=final)
+        self.assertEqual(list(engine._amaf_visits[0]), [0, 0, 1, 1, 0, 0, 0])
+        self.assertEqual(engine._amaf_wins[0].sum(), 0)
+        self.assertEqual(list(engine._amaf_visits[child]),
+                         [0, 0, 0, 1, 0, 0, 0])
+        self.assertEqual(engine._amaf_wins[child, 3], 1)
+
+        for batch in (1, 16):
+            engine = MonteCarloTreeSearch(100, rave=300, batch=batch)
+            engine.reroot(board)
+            engine.search(board, 100, engine.C)
+            self.assertEqual(engine._visits[engine._root], 100)
+            amaf = engine._amaf_visits[engine._root]
+            self.assertTrue((amaf >= engine.rootstats()[0]).all())
+            self.assertTrue((engine._amaf_wins[engine._root] <= amaf).all())
+
+        # without rave the statistics take no memory
+        self.assertEqual(MonteCarloTreeSearch()._amaf_visits.nbytes, 0)
+
+    def test_movetime(self):
+        engine = MonteCarloTreeSearch(movetime=0.2)
+        board = Board()
+        start = time.time()
+        with redirect_stdout(io.StringIO()):
+            engine.choose(board)
+        self.assertLess(time.time() - start, 1)
+
+        # O has to block, the other moves are lost
+        for m in [0, 6, 0, 6, 0]:
+            board = board.move(m)
+        engine.reroot(board)
+        engine.search(board, 200, engine.C)
+        engine.settimer(None)
+        self.assertFalse(engine.stopped())
+        engine.settimer(time.time() + 10)
+        self.assertFalse(engine.stopped())
+        # at 1 simulation every 100s the block can't be overtaken
+        engine._start -= 1000
+        engine._startvisits -= 10
+        self.assertTrue(engine.stopped())
+        engine.settimer(time.time() - 1)
+        self.assertTrue(engine.stopped())
+
+    def test_ponder(self):
+        engine = MonteCarloTreeSearch(20, ponder=1)
+        board = Board().move(3)
+        engine.ponder(board)
+        time.sleep(0.1)
+        engine.stop_pondering()
+        self.assertIsNone(engine._pondering)
+        visits = engine._visits[engine._root]
+        self.assertGreater(visits, 0)
+
+        # the pondered statistics are reused by the next search
+        reply = int(engine.rootstats()[0].argmax())
+        child = engine._children[engine._root, reply]
+        visits = engine._visits[child]
+        out = io.StringIO()
+        with redirect_stdout(out):
+            engine.choose(board.move(reply))
+        self.assertIn('reused simulations: %d' % visits, out.getvalue())
+
+        opponent = MonteCarloTreeSearch(20, ponder=1)
+        with redirect_stdout(io.StringIO()):
+            b, winner, looser = GameHandler(engine, opponent).play()
+        self.assertIsNotNone(b.end)
+        self.assertIsNone(engine._pondering)
+        self.assertIsNone(opponent._pondering)